@@ -39,16 +39,19 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'quotesapp',
     "users",
 ]
 
 MIDDLEWARE = [
+    'quotesapp.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'quotesapp.middleware.PrimaryPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -82,7 +85,7 @@ if os.getenv("POSTGRES_HOST") is None:
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'django.db.backends.postgresql',
         'NAME': os.getenv("POSTGRES_DB"),
         'USER': os.getenv("POSTGRES_USER"),
         'PASSWORD': os.getenv("POSTGRES_PASSWORD"),
@@ -91,6 +94,104 @@ DATABASES = {
     }
 }
 
+# Connection pooling (psycopg 3 with psycopg_pool). Every worker process owns
+# one pool per database alias, so POSTGRES_POOL_MAX_SIZE x worker processes
+# (x aliases on the same server) must stay below the server's max_connections.
+# Connections are health-checked before being handed out (CONN_HEALTH_CHECKS
+# makes Django pass ConnectionPool.check_connection to the pool), closed after
+# POSTGRES_POOL_MAX_IDLE idle seconds and replaced after MAX_LIFETIME; a request
+# waits at most POSTGRES_POOL_TIMEOUT seconds for a free connection. Usage is
+# reported by quotesapp.dbpool. With POSTGRES_POOL=False (e.g. with psycopg2)
+# connections are kept for POSTGRES_CONN_MAX_AGE seconds instead and
+# health-checked before reuse.
+
+DATABASE_POOL = os.getenv("POSTGRES_POOL", "True") == "True"
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+if DATABASE_POOL:
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv("POSTGRES_POOL_MIN_SIZE", "2")),
+            'max_size': int(os.getenv("POSTGRES_POOL_MAX_SIZE", "10")),
+            'timeout': float(os.getenv("POSTGRES_POOL_TIMEOUT", "10")),
+            'max_idle': float(os.getenv("POSTGRES_POOL_MAX_IDLE", "300")),
+            'max_lifetime': float(os.getenv("POSTGRES_POOL_MAX_LIFETIME", "3600")),
+        },
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv("POSTGRES_CONN_MAX_AGE", "60"))
+
+# Read replicas: a comma-separated list of host[:port] of streaming replicas
+# with the same database and credentials as the primary. Safe reads are routed
+# to them by quotesapp.routers.ReplicaRouter; writes, transactions and requests
+# that have written stay on the primary. A replica that fails to connect is
+# skipped for DATABASE_REPLICA_RETRY_SECONDS. After a write, the client's reads
+# stay on the primary for DATABASE_REPLICA_PIN_SECONDS (replication lag budget).
+
+DATABASE_REPLICAS = []
+for _number, _replica in enumerate(
+        filter(None, os.getenv("POSTGRES_REPLICAS", "").split(",")), start=1):
+    _host, _, _port = _replica.strip().partition(":")
+    DATABASES[f'replica{_number}'] = {
+        **DATABASES['default'],
+        'HOST': _host,
+        'PORT': _port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{_number}')
+
+DATABASE_ROUTERS = ['quotesapp.routers.ReplicaRouter']
+DATABASE_REPLICA_RETRY_SECONDS = int(os.getenv("POSTGRES_REPLICA_RETRY_SECONDS", "30"))
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv("POSTGRES_REPLICA_PIN_SECONDS", "5"))
+
+
+# MongoDB source of the data migration. The connection is opened lazily by
+# quotesapp.sources on the first migration run, never at import time.
+# MONGO_URI overrides the Atlas SRV string built from the other variables.
+
+MONGO_SOURCE = {
+    'URI': os.getenv("MONGO_URI"),
+    'NAME': os.getenv("MONGO_DB"),
+    'USER': os.getenv("MONGO_USER"),
+    'PASSWORD': os.getenv("MONGO_PASSWORD"),
+    'DOMAIN': os.getenv("MONGO_DOMAIN"),
+    'MAX_POOL_SIZE': int(os.getenv("MONGO_MAX_POOL_SIZE", "10")),
+    'CONNECT_TIMEOUT_MS': int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+    'SERVER_SELECTION_TIMEOUT_MS': int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+    'SOCKET_TIMEOUT_MS': int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000")),
+}
+
+
+# Caches
+# Rendered quote cards live in their own cache so they can be sized and shared
+# independently. Without QUOTE_CARD_CACHE_URL each process keeps an in-memory
+# LRU; with a Redis URL (requires the `redis` package) all workers share it.
+# Card keys carry the change versions of what they show, so neither setup
+# serves stale cards; entries under outdated keys expire after the timeout.
+
+QUOTE_CARD_CACHE_URL = os.getenv("QUOTE_CARD_CACHE_URL")
+QUOTE_CARD_CACHE_TIMEOUT = int(os.getenv("QUOTE_CARD_CACHE_TIMEOUT", "86400"))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'quote_cards': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': QUOTE_CARD_CACHE_URL,
+        'TIMEOUT': QUOTE_CARD_CACHE_TIMEOUT,
+    } if QUOTE_CARD_CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'quote-cards',
+        'TIMEOUT': QUOTE_CARD_CACHE_TIMEOUT,
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv("QUOTE_CARD_CACHE_SIZE", "20000"))},
+    },
+}
+
+# Cache alias and version of rendered quote cards; bump the version after
+# changing the card templates to drop every cached card at once.
+QUOTE_CARD_CACHE = 'quote_cards'
+QUOTE_CARD_VERSION = 1
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -142,3 +243,90 @@ EMAIL_USE_TLS = False
 EMAIL_HOST_USER = os.getenv("MAIL_USERNAME")
 EMAIL_HOST_PASSWORD = os.getenv("MAIL_PASSWORD")
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+
+# Quotes listing
+# Default number of quotes per page on the listing views. Clients may ask for
+# a different size with `?per_page=`, up to QUOTES_MAX_PAGE_SIZE.
+
+QUOTES_PAGE_SIZE = 10
+AUTHOR_QUOTES_PAGE_SIZE = 20
+TAG_QUOTES_PAGE_SIZE = 20
+QUOTES_MAX_PAGE_SIZE = 100
+
+# Number of tags in the "top tags" sidebar shown on every page.
+
+TAG_CLOUD_SIZE = 20
+
+# Number of "related tags" (most often found on the same quotes) shown on a
+# tag's page.
+
+RELATED_TAGS_SIZE = 10
+
+# Number of most used tags shown in an author's profile.
+
+AUTHOR_PROFILE_TOP_TAGS = 5
+
+# Text search configuration used to parse /search/ queries. It must match the
+# configuration of the Quote.search_vector triggers (quotesapp migration 0009).
+
+QUOTES_SEARCH_CONFIG = 'english'
+
+# JSON API (/api/...)
+# Default page size of the paginated endpoints (`?limit=` may ask for up to
+# QUOTES_MAX_PAGE_SIZE) and the number of rows fetched per server-side cursor
+# round trip when a response is streamed with `?stream=1`.
+
+API_PAGE_SIZE = 50
+API_STREAM_CHUNK_SIZE = int(os.getenv("API_STREAM_CHUNK_SIZE", "2000"))
+
+# Seconds the range of quote ids used to draw random quotes (/api/quotes/random/)
+# is cached; quotes added in the meantime are drawn once it is refreshed.
+
+RANDOM_QUOTE_RANGE_TIMEOUT = int(os.getenv("RANDOM_QUOTE_RANGE_TIMEOUT", "300"))
+
+# ASGI
+# Route the listing pages and the JSON API to their async views. Enable it when
+# serving through quotes.asgi (e.g. uvicorn, see README); keep it off under WSGI.
+
+QUOTES_ASYNC_VIEWS = os.getenv("QUOTES_ASYNC_VIEWS", "False") == "True"
+
+# Request instrumentation
+# With QUERY_INSTRUMENTATION=True every response carries a Server-Timing header
+# (SQL time and query count, template time, total) and a line is logged to
+# `quotesapp.requests`; a warning is logged when a view runs more than
+# QUERY_BUDGET queries (views may set their own budget with
+# quotesapp.instrumentation.query_budget). Off, nothing is installed.
+
+QUERY_INSTRUMENTATION = os.getenv("QUERY_INSTRUMENTATION", "False") == "True"
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "10"))
+if QUERY_INSTRUMENTATION:
+    TEMPLATES[0]['BACKEND'] = 'quotesapp.instrumentation.InstrumentedDjangoTemplates'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'quotesapp.requests': {
+            'handlers': ['console'],
+            'level': os.getenv("QUERY_LOG_LEVEL", "INFO"),
+            'propagate': False,
+        },
+    },
+}
+
+# MongoDB -> Postgres migration
+# Number of Mongo documents read and written per chunk by `migrate_data`, and
+# the number of worker processes used by the background migration job.
+
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "1000"))
+MIGRATION_WORKERS = int(os.getenv("MIGRATION_WORKERS", "1"))
+
+# Seconds after which a pending job that was never picked up, or a running job
+# whose heartbeat stopped (it is sent every quarter of this period), is
+# considered abandoned by a worker that was restarted or crashed, and is failed
+# so a new migration can start.
+
+MIGRATION_JOB_STALE_SECONDS = int(os.getenv("MIGRATION_JOB_STALE_SECONDS", "600"))
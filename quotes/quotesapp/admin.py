@@ -1,7 +1,9 @@
 from django.contrib import admin
-from .models import Author, Tag, Quote
+from .models import Author, Tag, Quote, MigrationJob, SyncCheckpoint
 
 # Register your models here.
 admin.site.register(Author)
 admin.site.register(Tag)
 admin.site.register(Quote)
+admin.site.register(MigrationJob)
+admin.site.register(SyncCheckpoint)
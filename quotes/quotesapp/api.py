@@ -0,0 +1,289 @@
+"""Read-only JSON API for quotes.
+
+Every endpoint answers in one of two modes:
+
+* paginated (the default): one keyset page of quotes with `next` and
+  `previous` cursors, selected with the `cursor` and `limit` GET parameters;
+* streamed (`?stream=1`): every matching quote as one JSON array, written by
+  a `StreamingHttpResponse` while the rows are read from a server-side cursor,
+  so memory stays flat whatever the size of the result.
+
+Rows are read with `values()` queries and the tags of a page (or of a
+streamed chunk) are loaded with a single query, see `quotesapp.streaming`.
+
+Each endpoint also has an async twin (`aquotes`, ...) built on the async
+ORM, routed instead of the sync one when `settings.QUOTES_ASYNC_VIEWS` is on.
+"""
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+
+from . import featured
+from .models import Author, Quote, Tag
+from .pagination import akeyset_paginate, keyset_paginate
+from .streaming import (
+    aiter_quotes, aserialize_rows, iter_quotes, quote_rows, serialize_rows,
+)
+# pylint: disable=no-member
+
+
+def _get_limit(request):
+    """Reads the `limit` GET parameter, clamped to the configured maximum."""
+    try:
+        limit = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except (TypeError, ValueError):
+        limit = settings.API_PAGE_SIZE
+    return max(1, min(limit, settings.QUOTES_MAX_PAGE_SIZE))
+
+
+def _stream_array(items):
+    """Yields `items` encoded as the chunks of a single JSON array."""
+    yield '['
+    for index, item in enumerate(items):
+        yield (',' if index else '') + json.dumps(item, cls=DjangoJSONEncoder)
+    yield ']'
+
+
+async def _astream_array(items):
+    """Async version of `_stream_array` over an async iterable."""
+    yield '['
+    first = True
+    async for item in items:
+        yield ('' if first else ',') + json.dumps(item, cls=DjangoJSONEncoder)
+        first = False
+    yield ']'
+
+
+def _is_stream(request):
+    return request.GET.get('stream') in ('1', 'true')
+
+
+def _stream_response(chunks):
+    response = StreamingHttpResponse(chunks, content_type='application/json')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _page_response(page, results):
+    return JsonResponse({
+        'results': results,
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+def _quotes_response(request, queryset):
+    """Answers an API request for `queryset` in paginated or streamed mode.
+
+    Args:
+        request (HttpRequest): The request. `?stream=1` streams every quote;
+            otherwise `cursor` and `limit` select one page.
+        queryset (QuerySet): The quotes to return.
+
+    Returns:
+        HttpResponse: A `StreamingHttpResponse` with a JSON array of quotes,
+        or a `JsonResponse` with `results`, `next` and `previous`.
+    """
+    if _is_stream(request):
+        return _stream_response(_stream_array(iter_quotes(queryset)))
+
+    page = keyset_paginate(
+        quote_rows(queryset), cursor=request.GET.get('cursor'), per_page=_get_limit(request),
+    )
+    return _page_response(page, serialize_rows(page.object_list))
+
+
+async def _aquotes_response(request, queryset):
+    """Async version of `_quotes_response`.
+
+    Streamed responses are fed by an async generator, which ASGI servers
+    consume without tying up a thread for the length of the download.
+    """
+    if _is_stream(request):
+        return _stream_response(_astream_array(aiter_quotes(queryset)))
+
+    page = await akeyset_paginate(
+        quote_rows(queryset), cursor=request.GET.get('cursor'), per_page=_get_limit(request),
+    )
+    return _page_response(page, await aserialize_rows(page.object_list))
+
+
+async def _aexists_or_404(queryset):
+    if not await queryset.aexists():
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+
+
+def _quote_response(quote, max_age=None):
+    """Answers with one serialized quote, or 404 if there is none."""
+    if quote is None:
+        raise Http404("There are no quotes yet.")
+    response = JsonResponse(quote)
+    response['Cache-Control'] = f'public, max-age={max_age}' if max_age else 'no-cache'
+    return response
+
+
+@require_GET
+def quotes(request):
+    """Returns quotes as JSON.
+
+    Args:
+        request (HttpRequest): The HTTP request object. `cursor` and `limit`
+            select a page; `stream=1` returns every quote as one streamed
+            JSON array instead.
+
+    Returns:
+        HttpResponse: The quotes, each as `{id, text, author: {id, name},
+        tags: [{id, name}]}`, in ascending id order.
+
+    Example Usage:
+        URL pattern in `urls.py`:
+
+        ```python
+        path('api/quotes/', api.quotes, name='api_quotes')
+        ```
+
+        Fetch the first page, then follow `next`:
+
+        ```
+        /api/quotes/?limit=50
+        /api/quotes/?limit=50&cursor=bjo1MA
+        ```
+    """
+    return _quotes_response(request, Quote.objects.all())
+
+
+@require_GET
+def author_quotes(request, author_id):
+    """Returns the quotes of one author as JSON.
+
+    Args:
+        request (HttpRequest): The HTTP request object, with the same
+            parameters as `quotes`.
+        author_id (int): The ID of the author.
+
+    Returns:
+        HttpResponse: The author's quotes, paginated or streamed.
+
+    Raises:
+        Http404: If the author with the specified `author_id` does not exist.
+
+    Example Usage:
+        ```
+        /api/authors/1/quotes/?stream=1
+        ```
+    """
+    author_ = get_object_or_404(Author.objects.only('id'), id=author_id)
+    return _quotes_response(request, Quote.objects.filter(author_id=author_.id))
+
+
+@require_GET
+def tag_quotes(request, tag_id):
+    """Returns the quotes carrying one tag as JSON.
+
+    Args:
+        request (HttpRequest): The HTTP request object, with the same
+            parameters as `quotes`.
+        tag_id (int): The ID of the tag.
+
+    Returns:
+        HttpResponse: The tag's quotes, paginated or streamed.
+
+    Raises:
+        Http404: If the tag with the specified `tag_id` does not exist.
+
+    Example Usage:
+        ```
+        /api/tags/1/quotes/?limit=100
+        ```
+    """
+    tag_ = get_object_or_404(Tag.objects.only('id'), id=tag_id)
+    return _quotes_response(request, Quote.objects.filter(tags__id=tag_.id))
+
+
+@require_GET
+def random_quote(request):  # pylint: disable=unused-argument
+    """Returns a random quote as JSON.
+
+    The quote is drawn in constant time by looking up a random id within the
+    cached range of quote ids, never with `ORDER BY random()` (see
+    `quotesapp.featured`), and is read with its author and tags in one query.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        JsonResponse: The quote as `{id, text, author: {id, name},
+        tags: [{id, name}]}`, not cacheable by clients.
+
+    Raises:
+        Http404: If there are no quotes.
+
+    Example Usage:
+        ```
+        /api/quotes/random/
+        ```
+    """
+    return _quote_response(featured.random_quote())
+
+
+@require_GET
+def quote_of_the_day(request):  # pylint: disable=unused-argument
+    """Returns the quote of the day as JSON.
+
+    The same quote is returned to everyone for the whole UTC day: the pick
+    is stored in `FeaturedQuote` and shared by every worker, which caches it
+    until midnight UTC. Clients may cache it until then too.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        JsonResponse: The quote, in the same format as `random_quote`.
+
+    Raises:
+        Http404: If there are no quotes.
+
+    Example Usage:
+        ```
+        /api/quotes/today/
+        ```
+    """
+    return _quote_response(featured.quote_of_the_day(), max_age=featured.utc_today()[1])
+
+
+@require_GET
+async def aquotes(request):
+    """Async version of `quotes`."""
+    return await _aquotes_response(request, Quote.objects.all())
+
+
+@require_GET
+async def aauthor_quotes(request, author_id):
+    """Async version of `author_quotes`."""
+    await _aexists_or_404(Author.objects.filter(id=author_id))
+    return await _aquotes_response(request, Quote.objects.filter(author_id=author_id))
+
+
+@require_GET
+async def atag_quotes(request, tag_id):
+    """Async version of `tag_quotes`."""
+    await _aexists_or_404(Tag.objects.filter(id=tag_id))
+    return await _aquotes_response(request, Quote.objects.filter(tags__id=tag_id))
+
+
+@require_GET
+async def arandom_quote(request):  # pylint: disable=unused-argument
+    """Async version of `random_quote`."""
+    return _quote_response(await featured.arandom_quote())
+
+
+@require_GET
+async def aquote_of_the_day(request):  # pylint: disable=unused-argument
+    """Async version of `quote_of_the_day`."""
+    return _quote_response(
+        await featured.aquote_of_the_day(), max_age=featured.utc_today()[1],
+    )
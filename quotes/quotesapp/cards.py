@@ -0,0 +1,191 @@
+"""Fragment cache for rendered quote cards.
+
+Listing pages spend most of their time rendering the same quote `<article>`
+blocks over and over. Each card is rendered once per variant and stored in
+the cache named by `settings.QUOTE_CARD_CACHE` (an in-process LRU by default,
+a shared cache such as Redis when configured), versioned with
+`settings.QUOTE_CARD_VERSION`. Listing views then only need the ids of a
+page: cards found in the cache are concatenated as they are, and only the
+missing quotes are loaded and rendered.
+
+A card's key holds the quote id and the change versions of what the card
+shows (see `quotesapp.versions`): the scope of the quote's author, bumped
+whenever the author or any of their quotes or quote tags change, and the
+`tags` scope, bumped whenever a tag is renamed or deleted. Both are read with
+one query per page, so every worker sees a change as soon as its versions are
+written, right after its commit, even when each keeps its own in-process cache; cards under outdated keys are
+never read again and expire after `QUOTE_CARD_CACHE_TIMEOUT`. Bumping
+`QUOTE_CARD_VERSION` drops every card at once, e.g. after editing the card
+templates.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import CharField, OuterRef, Subquery, Value, aprefetch_related_objects
+from django.db.models.functions import Cast, Concat
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import ChangeVersion, Quote
+from .versions import NEVER_CHANGED, TAGS, author_scope
+# pylint: disable=no-member
+
+VARIANTS = {
+    'full': 'quotesapp/cards/full.html',
+    'author': 'quotesapp/cards/author.html',
+    'tag': 'quotesapp/cards/tag.html',
+}
+
+
+def _cache():
+    return caches[settings.QUOTE_CARD_CACHE]
+
+
+def _key(variant, quote_id, stamp):
+    return f'quote-card:{variant}:{quote_id}:{stamp}'
+
+
+def _stamp(*versions):
+    return '.'.join(
+        str(round((version or NEVER_CHANGED).timestamp() * 1_000_000)) for version in versions
+    )
+
+
+def _stamp_rows(quote_ids):
+    """Returns `(id, author version, tags version)` rows of existing quotes.
+
+    Both versions are scalar subqueries on the `ChangeVersion` primary key;
+    the author's scope is built in SQL the same way as `author_scope`.
+    """
+    author_version = ChangeVersion.objects.filter(scope=Concat(
+        Value(author_scope('')), Cast(OuterRef('author_id'), CharField()),
+    )).values('changed_at')
+    tags_version = ChangeVersion.objects.filter(scope=TAGS).values('changed_at')
+    return Quote.objects.filter(id__in=quote_ids).values_list(
+        'id', Subquery(author_version), Subquery(tags_version),
+    )
+
+
+def card_keys(quote_ids, variant='full'):
+    """Returns the current cache keys of the cards of the given quotes.
+
+    Args:
+        quote_ids (Iterable[int]): The ids of the quotes.
+        variant (str): One of `VARIANTS`.
+
+    Returns:
+        dict: Mapping of quote id to card key. Ids of quotes that no longer
+        exist are left out.
+    """
+    return {
+        quote_id: _key(variant, quote_id, _stamp(*versions))
+        for quote_id, *versions in _stamp_rows(list(quote_ids))
+    }
+
+
+async def acard_keys(quote_ids, variant='full'):
+    """Async version of `card_keys`."""
+    return {
+        quote_id: _key(variant, quote_id, _stamp(*versions))
+        async for quote_id, *versions in _stamp_rows(list(quote_ids))
+    }
+
+
+def render_cards(quotes, variant='full'):
+    """Returns the cards of quotes that are already loaded.
+
+    Args:
+        quotes (Iterable[Quote]): Quotes with their author and tags loaded.
+        variant (str): One of `VARIANTS`.
+
+    Returns:
+        list[SafeString]: The rendered cards, in the order of `quotes`.
+            Quotes deleted since they were loaded are skipped.
+    """
+    quotes = list(quotes)
+    cache = _cache()
+    version = settings.QUOTE_CARD_VERSION
+    keys = card_keys((quote.id for quote in quotes), variant)
+    cached = cache.get_many(keys.values(), version=version)
+
+    fresh = {}
+    cards = []
+    for quote in quotes:
+        key = keys.get(quote.id)
+        if key is None:
+            continue
+        if key not in cached:
+            fresh[key] = render_to_string(VARIANTS[variant], {'quote': quote})
+        cards.append(mark_safe(cached.get(key) or fresh[key]))
+    if fresh:
+        cache.set_many(fresh, version=version)
+    return cards
+
+
+def load_cards(quote_ids, variant='full'):
+    """Returns the cards of the given quotes, loading only cache misses.
+
+    A fully cached page costs one query here, which reads the versions the
+    card keys are made of. Missing quotes are loaded with their author and
+    tags in two more queries and rendered.
+
+    Args:
+        quote_ids (Iterable[int]): The ids of the quotes to show.
+        variant (str): One of `VARIANTS`.
+
+    Returns:
+        list[SafeString]: The rendered cards, in the order of `quote_ids`.
+            Ids of quotes that no longer exist are skipped.
+    """
+    quote_ids = list(quote_ids)
+    cache = _cache()
+    version = settings.QUOTE_CARD_VERSION
+    keys = card_keys(quote_ids, variant)
+    cached = cache.get_many(keys.values(), version=version)
+
+    missing = [quote_id for quote_id, key in keys.items() if key not in cached]
+    if missing:
+        quotes = (
+            Quote.objects.select_related('author').defer('author__description')
+            .prefetch_related('tags')
+            .in_bulk(missing)
+        )
+        fresh = {
+            keys[quote_id]: render_to_string(VARIANTS[variant], {'quote': quote})
+            for quote_id, quote in quotes.items()
+        }
+        cache.set_many(fresh, version=version)
+        cached.update(fresh)
+
+    return [mark_safe(cached[keys[quote_id]]) for quote_id in quote_ids
+            if keys.get(quote_id) in cached]
+
+
+async def aload_cards(quote_ids, variant='full'):
+    """Async version of `load_cards`.
+
+    Cache lookups go through the cache's async API and missing quotes are
+    loaded with the async ORM, their tags with `aprefetch_related_objects`.
+    """
+    quote_ids = list(quote_ids)
+    cache = _cache()
+    version = settings.QUOTE_CARD_VERSION
+    keys = await acard_keys(quote_ids, variant)
+    cached = await cache.aget_many(keys.values(), version=version)
+
+    missing = [quote_id for quote_id, key in keys.items() if key not in cached]
+    if missing:
+        quotes = [
+            quote async for quote in
+            Quote.objects.select_related('author').defer('author__description')
+            .filter(id__in=missing)
+        ]
+        await aprefetch_related_objects(quotes, 'tags')
+        fresh = {
+            keys[quote.id]: render_to_string(VARIANTS[variant], {'quote': quote})
+            for quote in quotes
+        }
+        await cache.aset_many(fresh, version=version)
+        cached.update(fresh)
+
+    return [mark_safe(cached[keys[quote_id]]) for quote_id in quote_ids
+            if keys.get(quote_id) in cached]
@@ -0,0 +1,57 @@
+"""Metrics of the PostgreSQL connection pools of this process.
+
+With `OPTIONS['pool']` set, Django keeps one `psycopg_pool.ConnectionPool`
+per database alias in each worker process. The pool counts how long requests
+waited for a connection, how many are in use and how often a request timed
+out because the pool was exhausted; this module turns those counters into a
+JSON-serializable report.
+"""
+from django.db import connections
+
+
+def _pool(alias):
+    """Returns the connection pool of `alias`, or None if it has none."""
+    connection = connections[alias]
+    if not connection.settings_dict.get('OPTIONS', {}).get('pool'):
+        return None
+    return connection.pool
+
+
+def pool_stats():
+    """Returns the pool metrics of every pooled database alias.
+
+    Returns:
+        dict: Mapping of alias to a dictionary with the pool's `min_size`,
+        `max_size` and current `size`, the connections `in_use` and
+        `available`, the `waiting` requests, the number of connection
+        `requests` served so far with their total and average wait time in
+        milliseconds, and `exhausted`, the number of requests that timed out
+        waiting for a connection.
+    """
+    report = {}
+    for alias in connections:
+        pool = _pool(alias)
+        if pool is None or pool.closed:
+            # Pools are opened on the first query against their alias.
+            continue
+        stats = pool.get_stats()
+        size = stats.get('pool_size', 0)
+        available = stats.get('pool_available', 0)
+        requests = stats.get('requests_num', 0)
+        wait_ms = stats.get('requests_wait_ms', 0)
+        report[alias] = {
+            'min_size': stats.get('pool_min', pool.min_size),
+            'max_size': stats.get('pool_max', pool.max_size),
+            'size': size,
+            'in_use': size - available,
+            'available': available,
+            'waiting': stats.get('requests_waiting', 0),
+            'requests': requests,
+            'queued': stats.get('requests_queued', 0),
+            'wait_ms': wait_ms,
+            'avg_wait_ms': round(wait_ms / requests, 2) if requests else 0.0,
+            'exhausted': stats.get('requests_errors', 0),
+            'connections_opened': stats.get('connections_num', 0),
+            'connections_lost': stats.get('connections_lost', 0),
+        }
+    return report
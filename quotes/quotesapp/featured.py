@@ -0,0 +1,205 @@
+"""Random quote and quote of the day, in constant time.
+
+`order_by('?')` sorts the whole quotes table on every call. Instead, the
+range of quote ids (`MIN(id)`, `MAX(id)`, both answered from the primary key
+index) is cached for `settings.RANDOM_QUOTE_RANGE_TIMEOUT` seconds, and a
+random id within it is looked up by primary key. Ids left unused by deleted
+quotes are retried with a new random id a few times; after that the first
+quote at or after the last pick is taken, which is still one index lookup.
+Quotes added since the range was cached become eligible when it expires.
+
+The quote of the day is drawn the same way with a random generator seeded by
+the date. Since the pick also depends on the cached id range and on the
+quotes that exist at the time, the first pick of a date is stored in
+`FeaturedQuote` and every worker serves the stored one; each worker then
+caches it until midnight UTC.
+
+Each lookup returns the quote with its author and tags in one query on
+PostgreSQL (tags are aggregated with `ARRAY_AGG`); other databases load the
+tags with a second query.
+"""
+import random
+from datetime import datetime, time, timedelta, timezone
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max, Min, Q
+from django.db.models.functions import JSONObject
+
+from .models import FeaturedQuote, Quote
+from .streaming import QUOTE_FIELDS, aserialize_rows, serialize_rows
+# pylint: disable=no-member
+
+RANGE_KEY = 'quotes:id-range'
+TODAY_KEY = 'quotes:quote-of-the-day:{}'
+
+# Random ids tried before falling back to the next existing id.
+RANDOM_QUOTE_ATTEMPTS = 5
+
+
+def quote_id_range():
+    """Returns the cached `(lowest, highest)` quote id, or None if there are none."""
+    bounds = cache.get(RANGE_KEY)
+    if bounds is None:
+        bounds = Quote.objects.aggregate(low=Min('id'), high=Max('id'))
+        cache.set(RANGE_KEY, bounds, settings.RANDOM_QUOTE_RANGE_TIMEOUT)
+    return None if bounds['low'] is None else (bounds['low'], bounds['high'])
+
+
+async def aquote_id_range():
+    """Async version of `quote_id_range`."""
+    bounds = await cache.aget(RANGE_KEY)
+    if bounds is None:
+        bounds = await Quote.objects.aaggregate(low=Min('id'), high=Max('id'))
+        await cache.aset(RANGE_KEY, bounds, settings.RANDOM_QUOTE_RANGE_TIMEOUT)
+    return None if bounds['low'] is None else (bounds['low'], bounds['high'])
+
+
+def _aggregates_tags():
+    return connection.vendor == 'postgresql'
+
+
+def _lookups(bounds, rng):
+    """Yields the querysets to try in turn, each matching at most one quote."""
+    pick = None
+    for _ in range(RANDOM_QUOTE_ATTEMPTS):
+        pick = rng.randint(*bounds)
+        yield Quote.objects.filter(id=pick)
+    yield Quote.objects.filter(id__gte=pick).order_by('id')
+    yield Quote.objects.filter(id__lt=pick).order_by('-id')
+
+
+def _rows(queryset):
+    """Returns the first row of `queryset` as a sliced `values()` query.
+
+    On PostgreSQL the row carries its tags as a `tag_list` array.
+    """
+    rows = queryset.values(*QUOTE_FIELDS)
+    if _aggregates_tags():
+        rows = rows.annotate(tag_list=ArrayAgg(
+            JSONObject(id='tags__id', name='tags__name'),
+            filter=Q(tags__isnull=False),
+            ordering='tags__name',
+            default=[],
+        ))
+    return rows[:1]
+
+
+def _serialize(row):
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'author': {'id': row['author_id'], 'name': row['author__name']},
+        'tags': row['tag_list'],
+    }
+
+
+def _first(queryset):
+    """Returns the serialized first quote of `queryset`, or None."""
+    rows = list(_rows(queryset))
+    if not rows:
+        return None
+    return _serialize(rows[0]) if _aggregates_tags() else serialize_rows(rows)[0]
+
+
+async def _afirst(queryset):
+    """Async version of `_first`."""
+    rows = [row async for row in _rows(queryset)]
+    if not rows:
+        return None
+    return _serialize(rows[0]) if _aggregates_tags() else (await aserialize_rows(rows))[0]
+
+
+def random_quote(rng=None):
+    """Returns a random quote with its author and tags.
+
+    Args:
+        rng (random.Random, optional): The random generator to draw with.
+
+    Returns:
+        dict | None: `{id, text, author: {id, name}, tags: [{id, name}]}`, as
+        in the JSON API, or None if there are no quotes.
+    """
+    rng = rng or random
+    bounds = quote_id_range()
+    if bounds is None:
+        return None
+    for queryset in _lookups(bounds, rng):
+        quote = _first(queryset)
+        if quote is not None:
+            return quote
+    return None
+
+
+async def arandom_quote(rng=None):
+    """Async version of `random_quote`."""
+    rng = rng or random
+    bounds = await aquote_id_range()
+    if bounds is None:
+        return None
+    for queryset in _lookups(bounds, rng):
+        quote = await _afirst(queryset)
+        if quote is not None:
+            return quote
+    return None
+
+
+def utc_today():
+    """Returns today's UTC date and the seconds left until midnight UTC."""
+    now = datetime.now(timezone.utc)
+    midnight = datetime.combine(now.date() + timedelta(days=1), time(), tzinfo=timezone.utc)
+    return now.date(), max(int((midnight - now).total_seconds()), 1)
+
+
+def _featured(today):
+    return Quote.objects.filter(featured_days__date=today)
+
+
+def quote_of_the_day():
+    """Returns the quote of the current UTC day, cached until midnight UTC.
+
+    The stored pick of the day is read first. Only when there is none yet is
+    a quote drawn and stored; if another worker stored its pick first, the
+    insert is ignored and the stored pick is returned, so every worker
+    returns the same quote.
+
+    Returns:
+        dict | None: The quote, as returned by `random_quote`, or None if
+        there are no quotes.
+    """
+    today, timeout = utc_today()
+    key = TODAY_KEY.format(today.isoformat())
+    quote = cache.get(key)
+    if quote is None:
+        quote = _first(_featured(today))
+        if quote is None:
+            pick = random_quote(random.Random(today.toordinal()))
+            if pick is None:
+                return None
+            FeaturedQuote.objects.bulk_create(
+                [FeaturedQuote(date=today, quote_id=pick['id'])], ignore_conflicts=True,
+            )
+            quote = _first(_featured(today)) or pick
+        cache.set(key, quote, timeout)
+    return quote
+
+
+async def aquote_of_the_day():
+    """Async version of `quote_of_the_day`."""
+    today, timeout = utc_today()
+    key = TODAY_KEY.format(today.isoformat())
+    quote = await cache.aget(key)
+    if quote is None:
+        quote = await _afirst(_featured(today))
+        if quote is None:
+            pick = await arandom_quote(random.Random(today.toordinal()))
+            if pick is None:
+                return None
+            await FeaturedQuote.objects.abulk_create(
+                [FeaturedQuote(date=today, quote_id=pick['id'])], ignore_conflicts=True,
+            )
+            quote = await _afirst(_featured(today)) or pick
+        await cache.aset(key, quote, timeout)
+    return quote
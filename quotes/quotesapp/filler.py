@@ -1,23 +1,23 @@
 """Script to save quotes from MongoDB to Postgres.
 """
-import os
-from mongoengine import connect, Document
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+import django
+from bson import ObjectId
+from mongoengine import Document
 from mongoengine.fields import ReferenceField, ListField, StringField
-from dotenv import load_dotenv
-from django.db import transaction
-from .models import Tag, Author, Quote
+from django.conf import settings
+from django.db import connections, transaction
+from .models import Tag, Author, Quote, SyncCheckpoint
+from .routers import pin_primary
+from .sources import SOURCE_ALIAS, close_source, ensure_source
+from .streaming import chunked
+from .tagstats import link_quote_tags
+from .versions import QUOTES, author_scope, bump_versions, tag_scope
 # pylint: disable=no-member
 
-
-load_dotenv('../.env')
-mongo_user = os.getenv('MONGO_USER')
-mongodb_pass = os.getenv('MONGO_PASSWORD')
-db_name = os.getenv('MONGO_DB')
-domain = os.getenv('MONGO_DOMAIN')
-
-connect(
-    host=f"mongodb+srv://{mongo_user}:{mongodb_pass}@{domain}/{db_name}?retryWrites=true&w=majority"
-)
+logger = logging.getLogger(__name__)
 
 
 class Authors(Document):
@@ -44,6 +44,8 @@ class Authors(Document):
     born_location = StringField()
     description = StringField()
 
+    meta = {'db_alias': SOURCE_ALIAS}
+
 class Quotes(Document):
     """Represents a quote associated with an author.
 
@@ -64,69 +66,459 @@ class Quotes(Document):
     author = ReferenceField(Authors, required=True)
     quote = StringField(required=True)
 
+    meta = {'db_alias': SOURCE_ALIAS}
+
+
+def _upsert_names(model, names):
+    """Makes sure rows with the given names exist and returns their ids.
+
+    Missing rows are inserted with a single `INSERT ... ON CONFLICT DO
+    NOTHING`, then all ids are read back with one `IN` query, so resolving a
+    whole chunk of authors or tags costs two round trips whatever its size.
+    Names are inserted in sorted order so that parallel workers resolving
+    overlapping names always lock rows in the same order and cannot deadlock.
+
+    Args:
+        model (Model): `Author` or `Tag`, both keyed by a unique `name`.
+        names (set[str]): The names to resolve.
+
+    Returns:
+        dict: Mapping of name to primary key.
+    """
+    if not names:
+        return {}
+    model.objects.bulk_create(
+        [model(name=name) for name in sorted(names)],
+        ignore_conflicts=True,
+    )
+    return dict(model.objects.filter(name__in=names).values_list('name', 'id'))
+
+
+AUTHOR_BIO_FIELDS = ('born_date', 'born_location', 'description')
+
+
+def _author_row(doc):
+    """Builds an unsaved `Author` from a raw Mongo author document."""
+    fields = {
+        field: (doc.get(field) or '')[:Author._meta.get_field(field).max_length]
+        for field in AUTHOR_BIO_FIELDS
+    }
+    return Author(name=doc['fullname'], **fields)
+
+
+def _resolve_authors(mongo_author_ids):
+    """Upserts the authors of one chunk of quotes with their biographies.
+
+    Authors are inserted, or their biographical fields refreshed, with one
+    `INSERT ... ON CONFLICT DO UPDATE` in name order (so parallel workers
+    lock rows in the same order), which also returns their ids.
+
+    Args:
+        mongo_author_ids (set[ObjectId]): Author references found in the chunk.
+
+    Returns:
+        dict: Mapping of Mongo author id to `Author.id`.
+    """
+    docs = list(
+        Authors.objects(id__in=list(mongo_author_ids))
+        .only('fullname', *AUTHOR_BIO_FIELDS).as_pymongo()
+    )
+    rows = {doc['fullname']: _author_row(doc) for doc in docs}
+    authors = Author.objects.bulk_create(
+        [rows[name] for name in sorted(rows)],
+        update_conflicts=True,
+        unique_fields=['name'],
+        update_fields=list(AUTHOR_BIO_FIELDS),
+    )
+    author_ids = {author.name: author.id for author in authors}
+    return {doc['_id']: author_ids[doc['fullname']] for doc in docs}
+
+
+def _migrate_chunk(docs):
+    """Writes one chunk of raw Mongo quote documents to Postgres.
+
+    Authors and tags referenced by the chunk are resolved in bulk, then the
+    quotes are upserted on their unique `(author, content_hash)` key with one
+    `bulk_create` and linked to their tags with `link_quote_tags`, which also
+    increments the usage counters of tags that gained quotes. Quotes that already
+    exist (from an earlier run, another partition or a user) are not
+    duplicated: their text is refreshed and the new tags are added to them.
+
+    Quotes whose author reference points to no `Authors` document are
+    skipped and logged, so they cannot hold the checkpoint back forever.
 
-@transaction.atomic
-def migrate_data(request):
+    `bulk_create` sends no model signals, so the change versions of the
+    affected pages are bumped explicitly; they are written once the chunk's
+    transaction commits, which also retires the cached cards of the written
+    quotes.
+
+    Args:
+        docs (list[dict]): Raw quote documents as returned by `as_pymongo()`.
+    """
+    author_ids = _resolve_authors({doc.get('author') for doc in docs})
+    orphans = [doc['_id'] for doc in docs if doc.get('author') not in author_ids]
+    if orphans:
+        logger.warning(
+            "Skipping %d quote(s) whose author is missing from the source: %s",
+            len(orphans), ', '.join(map(str, orphans)),
+        )
+        docs = [doc for doc in docs if doc.get('author') in author_ids]
+        if not docs:
+            return
+    tag_ids = _upsert_names(Tag, {name for doc in docs for name in doc.get('tags', [])})
+
+    quotes = {}
+    for doc in docs:
+        author_id = author_ids[doc['author']]
+        content_hash = Quote.hash_text(doc['quote'])
+        quote, names = quotes.setdefault(
+            (author_id, content_hash),
+            (Quote(text=doc['quote'], author_id=author_id, content_hash=content_hash), set()),
+        )
+        names.update(doc.get('tags', []))
+
+    # In key order, like authors and names, so that partitions upserting
+    # the same quotes lock them in the same order and cannot deadlock.
+    Quote.objects.bulk_create(
+        [quotes[key][0] for key in sorted(quotes)],
+        update_conflicts=True,
+        unique_fields=['author', 'content_hash'],
+        update_fields=['text'],
+    )
+
+    link_quote_tags(
+        (quote.id, tag_ids[name])
+        for quote, names in quotes.values()
+        for name in names
+    )
+
+    bump_versions([
+        QUOTES,
+        *map(author_scope, {quote.author_id for quote, _ in quotes.values()}),
+        *map(tag_scope, {tag_ids[name] for _, names in quotes.values() for name in names}),
+    ])
+
+
+class MigrationStopped(Exception):
+    """Raised by a progress callback to stop a migration.
+
+    The chunk just reported is committed and its checkpoint saved, so the
+    next run resumes right after it.
+    """
+
+
+QUOTES_SOURCE = 'quotes'
+PARTITION_PREFIX = f'{QUOTES_SOURCE}:'
+MIN_OBJECT_ID = ObjectId('0' * 24)
+
+
+def get_checkpoint(source=QUOTES_SOURCE):
+    """Returns the ObjectId of the last migrated document of a source.
+
+    Args:
+        source (str): The name of the source collection.
+
+    Returns:
+        ObjectId | None: The high-water mark, or None if nothing was migrated.
+    """
+    last_id = (
+        SyncCheckpoint.objects.filter(source=source)
+        .values_list('last_id', flat=True)
+        .first()
+    )
+    return ObjectId(last_id) if last_id else None
+
+
+def save_checkpoint(last_id, source=QUOTES_SOURCE):
+    """Advances the high-water mark of a source to `last_id`.
+
+    Call this inside the transaction that writes the documents it covers.
+    """
+    SyncCheckpoint.objects.update_or_create(
+        source=source, defaults={'last_id': str(last_id)}
+    )
+
+
+def source_quotes(after=None, until=None):
+    """Returns the source quotes in the ObjectId range `(after, until]`.
+
+    Args:
+        after (ObjectId, optional): Exclusive lower bound.
+        until (ObjectId, optional): Inclusive upper bound.
+
+    Returns:
+        QuerySet: Matching Mongo quotes ordered by id.
+    """
+    ensure_source()
+    queryset = Quotes.objects
+    if after is not None:
+        queryset = queryset(id__gt=after)
+    if until is not None:
+        queryset = queryset(id__lte=until)
+    return queryset.order_by('id')
+
+
+def pending_source_quotes():
+    """Returns the source quotes that have not been migrated yet, by id."""
+    return source_quotes(after=get_checkpoint())
+
+
+def count_source_quotes():
+    """Returns the number of quote documents still to be migrated."""
+    return pending_source_quotes().count()
+
+
+def _migrate_range(after, until, batch_size, checkpoint, progress=None):
+    """Migrates the source quotes in `(after, until]`, one chunk at a time.
+
+    Args:
+        after (ObjectId | None): Exclusive lower bound of the range.
+        until (ObjectId | None): Inclusive upper bound, or None for no bound.
+        batch_size (int): Number of documents per chunk.
+        checkpoint (str): `SyncCheckpoint.source` advanced with every chunk.
+        progress (callable, optional): Called with the number of source
+            documents in each committed chunk.
+
+    Returns:
+        int: The number of source documents migrated.
+    """
+    mongo_quotes = (
+        source_quotes(after, until)
+        .no_dereference()
+        .only('id', 'quote', 'author', 'tags')
+        .batch_size(batch_size)
+        .as_pymongo()
+    )
+
+    migrated = 0
+    for docs in chunked(mongo_quotes, batch_size):
+        with transaction.atomic():
+            _migrate_chunk(docs)
+            save_checkpoint(docs[-1]['_id'], source=checkpoint)
+        migrated += len(docs)
+        if progress is not None:
+            progress(len(docs))
+    return migrated
+
+
+def _plan_partitions(workers):
+    """Splits the pending source quotes into ObjectId ranges, one per worker.
+
+    The plan is stored as one `SyncCheckpoint` per partition, named after the
+    partition's upper bound and holding its current position. If a previous
+    parallel run was interrupted, its unfinished plan is returned instead, so
+    every partition resumes from its own last committed chunk.
+
+    Args:
+        workers (int): The number of partitions to aim for.
+
+    Returns:
+        list[tuple]: `(after, until)` ObjectId pairs, ordered by `until`.
+    """
+    leftovers = SyncCheckpoint.objects.filter(source__startswith=PARTITION_PREFIX)
+    if leftovers.exists():
+        plan = [
+            (ObjectId(row.last_id), ObjectId(row.source[len(PARTITION_PREFIX):]))
+            for row in leftovers
+        ]
+        return sorted(plan, key=lambda bounds: bounds[1])
+
+    pending = pending_source_quotes()
+    total = pending.count()
+    if not total:
+        return []
+
+    bounds = []
+    for i in range(1, workers + 1):
+        offset = total * i // workers - 1
+        if offset < 0:
+            continue
+        doc = pending.only('id').skip(offset).limit(1).as_pymongo()
+        for row in doc:
+            if row['_id'] not in bounds:
+                bounds.append(row['_id'])
+
+    plan = []
+    after = get_checkpoint() or MIN_OBJECT_ID
+    with transaction.atomic():
+        for until in bounds:
+            save_checkpoint(after, source=f'{PARTITION_PREFIX}{until}')
+            plan.append((after, until))
+            after = until
+    return plan
+
+
+def _migrate_partition(after, until, batch_size, progress_queue=None, stop=None):
+    """Migrates one partition; runs inside a worker process.
+
+    Stops after the current chunk once the coordinating process sets `stop`.
+    """
+    def report(written):
+        if progress_queue is not None:
+            progress_queue.put(written)
+        if stop is not None and stop.is_set():
+            raise MigrationStopped(f"Partition up to {until} was stopped.")
+
+    try:
+        with pin_primary():
+            return _migrate_range(
+                after, until, batch_size,
+                checkpoint=f'{PARTITION_PREFIX}{until}',
+                progress=report,
+            )
+    finally:
+        connections.close_all()
+        close_source()
+
+
+def _migrate_parallel(workers, batch_size, progress=None):
+    """Migrates the pending source quotes with a pool of worker processes.
+
+    Each partition is an independent ObjectId range with its own checkpoint.
+    Authors and tags are resolved with conflict-free upserts, so workers that
+    meet the same names concurrently never insert duplicates. Once every
+    partition has finished, the source checkpoint is moved to the end of the
+    last partition and the partition checkpoints are removed. If a partition
+    fails, or `progress` raises `MigrationStopped`, the other partitions stop
+    after their current chunk and the next run resumes all of them.
+
+    Args:
+        workers (int): The number of worker processes.
+        batch_size (int): Number of documents per chunk.
+        progress (callable, optional): Called with the running number of
+            migrated documents after every committed chunk.
+
+    Returns:
+        int: The number of source documents migrated.
+    """
+    plan = _plan_partitions(workers)
+    if not plan:
+        return 0
+
+    migrated = 0
+    context = multiprocessing.get_context('spawn')
+    with context.Manager() as manager:
+        progress_queue = manager.Queue()
+        stop = manager.Event()
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(plan)),
+            mp_context=context,
+            initializer=django.setup,
+        ) as pool:
+            pending = {
+                pool.submit(_migrate_partition, after, until, batch_size, progress_queue, stop)
+                for after, until in plan
+            }
+            try:
+                while pending:
+                    done, pending = wait(pending, timeout=1)
+                    for future in done:
+                        future.result()
+                    while not progress_queue.empty():
+                        migrated += progress_queue.get()
+                        if progress is not None:
+                            progress(migrated)
+            except BaseException:
+                stop.set()
+                pool.shutdown(cancel_futures=True)
+                raise
+
+    with transaction.atomic():
+        save_checkpoint(plan[-1][1])
+        SyncCheckpoint.objects.filter(source__startswith=PARTITION_PREFIX).delete()
+    return migrated
+
+
+def migrate_data(batch_size=None, progress=None, workers=None):
     """Migrates data from MongoDB collections to the corresponding PostgreSQL models.
 
     This function is designed to be used within a Django project to transfer
     data from MongoDB to PostgreSQL. The data includes authors, quotes, and tags.
-    The function ensures that all operations are performed atomically, meaning
-    either all of the data is transferred successfully, or none of it is,
-    preventing partial migrations in case of an error.
+    Every chunk is written in its own transaction, so a long migration never
+    holds locks for longer than one chunk takes, and a chunk is either written
+    completely or not at all.
+
+    The migration is incremental: documents are read in ObjectId order,
+    starting after the checkpoint stored in `SyncCheckpoint`, and the
+    checkpoint is advanced in the same transaction as each chunk. Re-running
+    it only reads documents added since the last run, and an interrupted run
+    resumes after its last committed chunk.
+
+    With more than one worker, the pending documents are split into ObjectId
+    ranges that are migrated concurrently by a process pool (see
+    `_migrate_parallel`). An interrupted parallel run is always resumed with
+    its original partitions, whatever worker count the next run asks for.
 
     Args:
-        request: The HTTP request object that initiated this migration.
+        batch_size (int, optional): Number of Mongo documents processed per
+            chunk. Defaults to `settings.MIGRATION_BATCH_SIZE`.
+        progress (callable, optional): Called with the running number of
+            migrated documents after every committed chunk. It may raise
+            `MigrationStopped` to stop the migration after that chunk.
+        workers (int, optional): Number of worker processes. Defaults to
+            `settings.MIGRATION_WORKERS`.
 
     Returns:
-        request: The original HTTP request object.
+        int: The number of source documents migrated. Documents that repeat
+        a quote already written, in the same run or before, count too, so
+        the number can be compared with `count_source_quotes`.
 
-    The function performs the following steps:
+    The function streams quotes from MongoDB as raw documents without
+    dereferencing authors, and processes them in chunks of `batch_size`:
 
-    1. **Authors Migration**:
-        - Fetches all authors from MongoDB.
-        - Creates or retrieves corresponding `Author` objects in PostgreSQL.
-        - Maps the MongoDB author IDs to the corresponding PostgreSQL IDs for
-            linking quotes later.
+    1. **Authors**:
+        - Looks up the Mongo authors referenced by the chunk in one query.
+        - Inserts missing `Author` rows in bulk and reads back their ids.
 
-    2. **Quotes Migration**:
-        - Fetches all quotes from MongoDB.
-        - For each quote, retrieves or creates the associated tags in PostgreSQL.
-        - Creates a new `Quote` object in PostgreSQL, associates it with the
-            appropriate author using the `author_mapping`, and sets the related tags.
+    2. **Tags**:
+        - Collects every tag name used in the chunk.
+        - Inserts missing `Tag` rows in bulk and reads back their ids.
 
-    The `@transaction.atomic` decorator ensures that all database operations
-    are wrapped in a single transaction. If any error occurs during the migration,
-    all changes are rolled back to maintain database consistency.
+    3. **Quotes**:
+        - Creates all `Quote` rows of the chunk with one `bulk_create`.
+        - Links them to their tags with one `INSERT ... ON CONFLICT DO
+            NOTHING` on the many-to-many through table, and increments the
+            usage counters of tags by the links that were new.
+
+    Each chunk therefore costs a fixed number of round trips to both
+    databases, and only one chunk of documents is held in memory at a time.
+    The MongoDB connection is opened lazily on the first run and its pool is
+    reused by later runs (see `quotesapp.sources`).
 
     Example Usage:
-        This function can be triggered by a Django view to start the migration
-        process when needed, typically for administrative purposes.
+        This function is run in the background by `quotesapp.jobs` when the
+        `migration` view enqueues a job, or from the command line with
+        `python manage.py migrate_mongo --workers 4`.
+
+    All queries go to the primary database, never to a read replica, so
+    checkpoints and freshly inserted names are always read back up to date.
 
     Raises:
-        Exception: If there is any error during the migration, it will trigger
-        a rollback of all database operations performed in this function.
+        Exception: If there is any error during the migration, the chunk being
+        written is rolled back; chunks committed before it are kept.
     """
-    mongo_authors = Authors.objects()
-    author_mapping = {}
+    with pin_primary():
+        return _migrate_data(batch_size, progress, workers)
 
-    for mongo_author in mongo_authors:
-        author, _ = Author.objects.get_or_create(name=mongo_author.fullname)
-        author_mapping[str(mongo_author.id)] = author.id
 
-    mongo_quotes = Quotes.objects()
+def _migrate_data(batch_size, progress, workers):
+    batch_size = batch_size or settings.MIGRATION_BATCH_SIZE
+    workers = workers or settings.MIGRATION_WORKERS
+    resuming = SyncCheckpoint.objects.filter(source__startswith=PARTITION_PREFIX).exists()
+    if workers > 1 or resuming:
+        return _migrate_parallel(max(workers, 1), batch_size, progress)
 
-    for mongo_quote in mongo_quotes:
-        tags = []
-        for tag_name in mongo_quote.tags:
-            tag, _ = Tag.objects.get_or_create(name=tag_name)
-            tags.append(tag)
+    migrated = 0
 
-        quote = Quote.objects.create(
-            text=mongo_quote.quote,
-            author_id=author_mapping[str(mongo_quote.author.id)]
-        )
-        quote.tags.set(tags)
-        quote.save()
+    def report(written):
+        nonlocal migrated
+        migrated += written
+        if progress is not None:
+            progress(migrated)
 
-    return request
+    _migrate_range(
+        get_checkpoint(), None, batch_size,
+        checkpoint=QUOTES_SOURCE,
+        progress=report,
+    )
+    return migrated
@@ -75,7 +75,9 @@ class QuoteForm(ModelForm):
             a free text input and should be an existing author. (Note: This
             may need to be adjusted for use in practice.)
         text (CharField): The text of the quote. Must be between 10 and 250
-            characters long and is required.
+            characters long and is required. The same author may not have the
+            same text twice; this is checked with a single probe of the
+            `(author, content_hash)` index.
 
     Meta:
         model (Quote): The model associated with this form.
@@ -100,6 +102,8 @@ class QuoteForm(ModelForm):
         widget=Textarea()
     )
 
+    DUPLICATE_ERROR = "This author already has this quote."
+
     class Meta:
         """meta"""
         model = Quote
@@ -108,3 +112,16 @@ class QuoteForm(ModelForm):
         widgets = {
             'text': Textarea(attrs={'rows': 4, 'cols': 40}),
         }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        author_id = cleaned_data.get('author')
+        text = cleaned_data.get('text')
+        if author_id and author_id.isdigit() and text:
+            duplicate = Quote.objects.filter(
+                author_id=author_id,
+                content_hash=Quote.hash_text(text),
+            ).exists()
+            if duplicate:
+                self.add_error('text', self.DUPLICATE_ERROR)
+        return cleaned_data
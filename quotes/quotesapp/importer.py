@@ -0,0 +1,308 @@
+"""Bulk import of curated quote files with PostgreSQL `COPY`.
+
+Rows are read from NDJSON or CSV files (the layouts written by
+`export_quotes`), hashed in Python and streamed with `COPY` into a temporary
+staging table. Authors, tags, quotes and tag links are then merged into the
+real tables with one set-based statement each:
+
+* authors and tags are inserted with `ON CONFLICT DO NOTHING`;
+* quotes are inserted on their unique `(author, content_hash)` key, so quotes
+  that already exist, or appear twice in the file, are not duplicated;
+* tag links are inserted with `ON CONFLICT DO NOTHING RETURNING`, and the
+  links actually created are added to each tag's `usage_count` and counted
+  into `TagCooccurrence`.
+
+Everything runs in one transaction, so a dry run is the same import rolled
+back at the end, and its statistics are exactly what a real run would do.
+"""
+import csv
+import io
+import json
+
+from django.db import NotSupportedError, connection, transaction
+
+from .models import Author, Quote, Tag, TagCooccurrence
+from .streaming import CSV_TAG_SEPARATOR, chunked
+from .versions import QUOTES, TAG_CLOUD, author_scope, bump_versions, tag_scope
+# pylint: disable=no-member
+
+QuoteTags = Quote.tags.through
+
+COPY_BATCH_SIZE = 50000
+
+# Tags travel through the staging table as one text column joined with the
+# ASCII unit separator, which cannot occur in a tag typed by a person.
+STAGE_TAG_SEPARATOR = '\x1f'
+
+STAGE_TABLE = 'quotesapp_quote_import'
+
+
+def _field_limit(model, field):
+    """Returns the `max_length` of a model's character field."""
+    return model._meta.get_field(field).max_length
+
+
+def _tag_names(tags):
+    """Returns tag names from an exported `tags` value.
+
+    Accepts a list of names, a list of `{id, name}` objects as written by
+    the NDJSON export, or a string of names joined with `CSV_TAG_SEPARATOR`.
+    """
+    if not tags:
+        return []
+    if isinstance(tags, str):
+        tags = tags.split(CSV_TAG_SEPARATOR)
+    names = (tag['name'] if isinstance(tag, dict) else tag for tag in tags)
+    return [name.strip() for name in names if name and name.strip()]
+
+
+def read_ndjson(lines):
+    """Yields `(author, text, tags)` tuples from NDJSON lines.
+
+    `author` may be a name or an `{id, name}` object, so files written by
+    `export_quotes` can be loaded back as they are.
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        author = record.get('author') or ''
+        if isinstance(author, dict):
+            author = author.get('name') or ''
+        yield author, record.get('text') or '', _tag_names(record.get('tags'))
+
+
+def read_csv(lines):
+    """Yields `(author, text, tags)` tuples from CSV lines with a header row.
+
+    The `author` and `text` columns are required; `tags` is optional and holds
+    names joined with `CSV_TAG_SEPARATOR`. Other columns are ignored.
+    """
+    for record in csv.DictReader(lines):
+        yield record.get('author') or '', record.get('text') or '', _tag_names(record.get('tags'))
+
+
+READERS = {
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+
+def _copy(cursor, sql, buffer):
+    """Feeds `buffer` to a `COPY ... FROM STDIN` statement.
+
+    Works with both PostgreSQL drivers Django supports: psycopg 3 exposes
+    `Cursor.copy()`, psycopg2 `cursor.copy_expert()`.
+    """
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3  # pylint: disable=import-outside-toplevel
+
+    raw = cursor.cursor
+    if is_psycopg3:
+        with raw.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+    else:
+        buffer.seek(0)
+        raw.copy_expert(sql, buffer)
+
+
+def _stage(cursor, rows, batch_size):
+    """Validates and hashes `rows` and copies them into the staging table.
+
+    Rows without an author or text, or with a value longer than its column
+    allows, are rejected instead of failing the whole import.
+
+    Returns:
+        tuple[int, int]: The numbers of staged and rejected rows.
+    """
+    author_limit = _field_limit(Author, 'name')
+    text_limit = _field_limit(Quote, 'text')
+    tag_limit = _field_limit(Tag, 'name')
+    staged = rejected = 0
+    sql = f"COPY {STAGE_TABLE} (author, text, content_hash, tags) FROM STDIN WITH (FORMAT csv)"
+
+    for batch in chunked(rows, batch_size):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for author, text, tags in batch:
+            author = ' '.join(author.split())
+            text = text.strip()
+            if (
+                not author or not text
+                or len(author) > author_limit or len(text) > text_limit
+                or any(len(tag) > tag_limit for tag in tags)
+            ):
+                rejected += 1
+                continue
+            writer.writerow((
+                author, text, Quote.hash_text(text), STAGE_TAG_SEPARATOR.join(tags),
+            ))
+            staged += 1
+        _copy(cursor, sql, buffer)
+    return staged, rejected
+
+
+def _merge(cursor):
+    """Merges the staging table into authors, tags, quotes and tag links.
+
+    Returns:
+        dict: Counts of new `authors`, `tags`, `quotes` and `links`, and the
+        ids needed to invalidate caches: `author_ids` and `tag_ids` whose
+        pages changed.
+    """
+    author = connection.ops.quote_name(Author._meta.db_table)
+    tag = connection.ops.quote_name(Tag._meta.db_table)
+    quote = connection.ops.quote_name(Quote._meta.db_table)
+    links = connection.ops.quote_name(QuoteTags._meta.db_table)
+    cooccurrence = connection.ops.quote_name(TagCooccurrence._meta.db_table)
+    separator = f"chr({ord(STAGE_TAG_SEPARATOR)})"
+
+    cursor.execute(
+        f"WITH inserted AS ("
+        f" INSERT INTO {author} (name)"
+        f" SELECT DISTINCT author FROM {STAGE_TABLE} ORDER BY 1"
+        f" ON CONFLICT (name) DO NOTHING RETURNING 1"
+        f") SELECT count(*) FROM inserted"
+    )
+    authors = cursor.fetchone()[0]
+
+    cursor.execute(
+        f"WITH inserted AS ("
+        f" INSERT INTO {tag} (name, usage_count)"
+        f" SELECT DISTINCT name, 0 FROM {STAGE_TABLE},"
+        f" unnest(string_to_array(tags, {separator})) AS name"
+        f" WHERE name <> '' ORDER BY 1"
+        f" ON CONFLICT (name) DO NOTHING RETURNING 1"
+        f") SELECT count(*) FROM inserted"
+    )
+    tags = cursor.fetchone()[0]
+
+    # Resolve every staged row to its author once; the quote and link
+    # statements below both join on it.
+    cursor.execute(
+        f"UPDATE {STAGE_TABLE} s SET author_id = a.id FROM {author} a WHERE a.name = s.author"
+    )
+    cursor.execute(f"ANALYZE {STAGE_TABLE}")
+    cursor.execute(
+        f"CREATE TEMPORARY TABLE {STAGE_TABLE}_new (id bigint PRIMARY KEY) ON COMMIT DROP"
+    )
+    cursor.execute(
+        f"WITH inserted AS ("
+        f" INSERT INTO {quote} (author_id, text, content_hash)"
+        f" SELECT DISTINCT ON (author_id, content_hash) author_id, text, content_hash"
+        f" FROM {STAGE_TABLE} ORDER BY author_id, content_hash"
+        f" ON CONFLICT (author_id, content_hash) DO NOTHING RETURNING id"
+        f") INSERT INTO {STAGE_TABLE}_new SELECT id FROM inserted"
+    )
+    quotes = cursor.rowcount
+
+    cursor.execute(
+        f"CREATE TEMPORARY TABLE {STAGE_TABLE}_links"
+        f" (quote_id bigint, tag_id bigint) ON COMMIT DROP"
+    )
+    cursor.execute(
+        f"WITH inserted AS ("
+        f" INSERT INTO {links} (quote_id, tag_id)"
+        f" SELECT DISTINCT q.id, t.id FROM {STAGE_TABLE} s"
+        f" JOIN {quote} q ON q.author_id = s.author_id AND q.content_hash = s.content_hash"
+        f" CROSS JOIN LATERAL unnest(string_to_array(s.tags, {separator})) AS n(name)"
+        f" JOIN {tag} t ON t.name = n.name"
+        f" ORDER BY 1, 2"
+        f" ON CONFLICT DO NOTHING RETURNING quote_id, tag_id"
+        f") INSERT INTO {STAGE_TABLE}_links SELECT quote_id, tag_id FROM inserted"
+    )
+    link_count = cursor.rowcount
+
+    # Lock the counted tags in id order, as adjust_usage_counts does, so
+    # concurrent writers cannot deadlock on them.
+    cursor.execute(
+        f"SELECT id FROM {tag} WHERE id IN (SELECT tag_id FROM {STAGE_TABLE}_links)"
+        f" ORDER BY id FOR UPDATE"
+    )
+    tag_ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        f"UPDATE {tag} t SET usage_count = t.usage_count + c.uses"
+        f" FROM (SELECT tag_id, count(*) AS uses FROM {STAGE_TABLE}_links GROUP BY tag_id) c"
+        f" WHERE t.id = c.tag_id"
+    )
+
+    # Count each new link against every other tag of its quote, in both
+    # directions, without counting a pair of two new links twice (see
+    # quotesapp.tagstats.cooccurrence_deltas).
+    cursor.execute(
+        f"INSERT INTO {cooccurrence} (tag_id, related_id, count)"
+        f" SELECT tag_id, related_id, count(*) FROM ("
+        f"  SELECT n.tag_id, l.tag_id AS related_id FROM {STAGE_TABLE}_links n"
+        f"  JOIN {links} l ON l.quote_id = n.quote_id AND l.tag_id <> n.tag_id"
+        f"  UNION ALL"
+        f"  SELECT l.tag_id, n.tag_id FROM {STAGE_TABLE}_links n"
+        f"  JOIN {links} l ON l.quote_id = n.quote_id AND l.tag_id <> n.tag_id"
+        f"  WHERE NOT EXISTS (SELECT 1 FROM {STAGE_TABLE}_links o"
+        f"   WHERE o.quote_id = l.quote_id AND o.tag_id = l.tag_id)"
+        f" ) pairs GROUP BY tag_id, related_id ORDER BY tag_id, related_id"
+        f" ON CONFLICT (tag_id, related_id)"
+        f" DO UPDATE SET count = {cooccurrence}.count + EXCLUDED.count"
+    )
+
+    cursor.execute(
+        f"SELECT DISTINCT author_id FROM {quote} WHERE id IN ("
+        f" SELECT id FROM {STAGE_TABLE}_new UNION SELECT quote_id FROM {STAGE_TABLE}_links)"
+    )
+    author_ids = [row[0] for row in cursor.fetchall()]
+
+    return {
+        'authors': authors,
+        'tags': tags,
+        'quotes': quotes,
+        'links': link_count,
+        'author_ids': author_ids,
+        'tag_ids': tag_ids,
+    }
+
+
+def import_quotes(rows, dry_run=False, batch_size=None):
+    """Imports `(author, text, tags)` rows in a single transaction.
+
+    Args:
+        rows (Iterable[tuple[str, str, list[str]]]): The rows to import, e.g.
+            from `read_ndjson` or `read_csv`.
+        dry_run (bool, optional): Run the whole import, then roll it back.
+        batch_size (int, optional): Rows sent per `COPY`. Defaults to
+            `COPY_BATCH_SIZE`.
+
+    Returns:
+        dict: The `staged` and `rejected` row counts and the counts of new
+        `authors`, `tags`, `quotes` and `links`.
+
+    Raises:
+        NotSupportedError: If the default database is not PostgreSQL.
+    """
+    if connection.vendor != 'postgresql':
+        raise NotSupportedError("import_quotes requires PostgreSQL (it uses COPY).")
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE {STAGE_TABLE} ("
+                f" author text NOT NULL, text text NOT NULL,"
+                f" content_hash varchar(64) NOT NULL, tags text, author_id bigint"
+                f") ON COMMIT DROP"
+            )
+            staged, rejected = _stage(cursor, rows, batch_size or COPY_BATCH_SIZE)
+            stats = _merge(cursor)
+
+        if dry_run:
+            transaction.set_rollback(True)
+        elif stats['quotes'] or stats['links']:
+            # Raw SQL sends no model signals: bump the affected pages, which
+            # also retires the cards of existing quotes that gained tags.
+            bump_versions(
+                [QUOTES, TAG_CLOUD]
+                + [author_scope(author_id) for author_id in stats['author_ids']]
+                + [tag_scope(tag_id) for tag_id in stats['tag_ids']]
+            )
+
+    return {
+        'staged': staged,
+        'rejected': rejected,
+        **{key: stats[key] for key in ('authors', 'tags', 'quotes', 'links')},
+    }
@@ -0,0 +1,147 @@
+"""Per-request SQL and template timing.
+
+When `settings.QUERY_INSTRUMENTATION` is on, `QueryInstrumentationMiddleware`
+(see `quotesapp.middleware`) starts a `RequestMetrics` for every request.
+Every database connection gets `record_query` as an execute wrapper, and the
+template backend is swapped for `InstrumentedDjangoTemplates`. Both add to
+the metrics of the current request, found through a context variable, so
+queries run from `sync_to_async` threads are counted too.
+
+When the setting is off, nothing is installed and there is no overhead at all.
+"""
+import contextvars
+import time
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+
+class RequestMetrics:
+    """Query and template timings collected during one request.
+
+    Attributes:
+        queries (int): Number of SQL statements executed.
+        sql_time (float): Total time spent executing them, in seconds.
+        slowest_sql (str): The slowest statement.
+        slowest_time (float): Its duration, in seconds.
+        template_time (float): Time spent rendering templates, in seconds.
+        started (float): `time.perf_counter()` at the start of the request.
+    """
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.slowest_sql = ''
+        self.slowest_time = 0.0
+        self.template_time = 0.0
+        self.started = time.perf_counter()
+
+    def add_query(self, sql, duration):
+        """Records one executed statement."""
+        self.queries += 1
+        self.sql_time += duration
+        if duration > self.slowest_time:
+            self.slowest_time = duration
+            self.slowest_sql = sql
+
+    def elapsed(self):
+        """Returns the seconds since the request started."""
+        return time.perf_counter() - self.started
+
+
+_metrics = contextvars.ContextVar('quotesapp_request_metrics', default=None)
+
+
+def start_request():
+    """Starts collecting metrics for the current request.
+
+    Returns:
+        tuple: `(metrics, token)`; pass the token to `end_request`.
+    """
+    metrics = RequestMetrics()
+    return metrics, _metrics.set(metrics)
+
+
+def end_request(token):
+    """Stops collecting metrics for the request started with `token`."""
+    _metrics.reset(token)
+
+
+def current_metrics():
+    """Returns the metrics of the current request, or None outside one."""
+    return _metrics.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper timing every statement of the current request."""
+    metrics = _metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - start)
+
+
+def _install_wrapper(sender, connection, **kwargs):  # pylint: disable=unused-argument
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install():
+    """Adds `record_query` to every current and future database connection."""
+    connection_created.connect(_install_wrapper, dispatch_uid='quotesapp_record_query')
+    for connection in connections.all(initialized_only=True):
+        _install_wrapper(None, connection)
+
+
+def query_budget(queries):
+    """Overrides `settings.QUERY_BUDGET` for one view.
+
+    Example Usage:
+        ```python
+        @query_budget(5)
+        def main(request):
+            ...
+        ```
+    """
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
+
+
+class _TimedTemplate:
+    """Wraps a backend template to add its render time to the request."""
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        """Renders the template, timing it if a request is instrumented."""
+        metrics = _metrics.get()
+        if metrics is None:
+            return self.template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing every top-level render.
+
+    Included templates and inclusion tags are rendered inside their parent,
+    so their time is counted once, as part of it.
+    """
+    def from_string(self, template_code):
+        """Returns a timed template compiled from `template_code`."""
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        """Returns the timed template named `template_name`."""
+        return _TimedTemplate(super().get_template(template_name))
@@ -0,0 +1,222 @@
+"""Background execution of the MongoDB to PostgreSQL migration.
+
+The `migration` view only records a `MigrationJob` row and hands its id to a
+local in-process queue. A single daemon worker thread picks jobs off the
+queue and runs `migrate_data`, updating the job row after every committed
+chunk, so the request returns immediately and progress can be polled from
+the job status endpoint.
+
+The database row, not the queue, decides who runs a job: the worker claims
+it with `SELECT ... FOR UPDATE SKIP LOCKED`, and a partial unique index
+allows a single pending or running job. While a job runs, a timer thread
+refreshes its heartbeat, however long a chunk takes. Jobs left behind by a
+worker that was recycled or crashed stop sending heartbeats;
+`enqueue_migration` fails them once they are older than
+`settings.MIGRATION_JOB_STALE_SECONDS`, so a new migration can be started, and
+it resumes from the last checkpoint. Every later update of a job only applies
+while it is still running, so a worker whose job was failed anyway stops after
+its current chunk and cannot overwrite the outcome.
+"""
+import logging
+import queue
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .filler import MigrationStopped, count_source_quotes, migrate_data
+from .models import MigrationJob
+from .routers import pin_primary
+# pylint: disable=no-member
+
+logger = logging.getLogger(__name__)
+
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _ensure_worker():
+    """Starts the worker thread if it is not running in this process."""
+    global _worker  # pylint: disable=global-statement
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(
+                target=_work, name='quotes-migration-worker', daemon=True
+            )
+            _worker.start()
+
+
+def _work():
+    """Runs queued migration jobs one at a time, forever."""
+    while True:
+        job_id = _queue.get()
+        try:
+            close_old_connections()
+            with pin_primary():
+                run_migration_job(job_id)
+        finally:
+            connections.close_all()
+            _queue.task_done()
+
+
+def _fail_stale_jobs():
+    """Fails the active jobs whose worker has stopped, as seen from now.
+
+    Pending jobs are stale when they were never claimed, running jobs when
+    their last heartbeat is older than `settings.MIGRATION_JOB_STALE_SECONDS`.
+    A live worker refreshes the heartbeat every quarter of that period (see
+    `_heartbeat`), so only jobs whose worker is gone, or cannot reach the
+    database, go stale. Rows being claimed or updated at this moment are
+    skipped.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.MIGRATION_JOB_STALE_SECONDS)
+    stale = (
+        MigrationJob.objects.select_for_update(skip_locked=True)
+        .filter(
+            Q(status=MigrationJob.PENDING, created_at__lt=cutoff)
+            | Q(status=MigrationJob.RUNNING, heartbeat_at__lt=cutoff)
+        )
+        .values_list('id', flat=True)
+    )
+    ids = list(stale)
+    if ids:
+        logger.warning("Failing abandoned migration jobs %s", ids)
+        MigrationJob.objects.filter(id__in=ids).update(
+            status=MigrationJob.FAILED,
+            error='The worker running this job stopped.',
+            finished_at=now,
+        )
+
+
+def _active_job():
+    return MigrationJob.objects.filter(status__in=MigrationJob.ACTIVE).order_by('id').first()
+
+
+def enqueue_migration():
+    """Creates a migration job and queues it for the background worker.
+
+    Only one migration runs at a time: if a job is already pending or running
+    it is returned instead of creating a new one. Jobs abandoned by a worker
+    that is gone are failed first, so they cannot block new migrations. Two
+    concurrent calls cannot both create a job: the second insert violates the
+    one-active-job index and returns the job created by the first.
+
+    Returns:
+        MigrationJob: The queued or already active job.
+    """
+    with transaction.atomic():
+        _fail_stale_jobs()
+        active = _active_job()
+        if active is not None:
+            return active
+        try:
+            with transaction.atomic():
+                job = MigrationJob.objects.create()
+        except IntegrityError:
+            return _active_job()
+
+        _ensure_worker()
+        transaction.on_commit(lambda: _queue.put(job.id))
+    return job
+
+
+def _claim(job_id):
+    """Marks a pending job as running, unless another worker has it.
+
+    Returns:
+        MigrationJob | None: The claimed job, or None if it is no longer
+        pending or is locked by another worker.
+    """
+    with transaction.atomic():
+        job = (
+            MigrationJob.objects.select_for_update(skip_locked=True)
+            .filter(id=job_id, status=MigrationJob.PENDING)
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = MigrationJob.RUNNING
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at'])
+    return job
+
+
+def _touch(job_id, **fields):
+    """Refreshes the heartbeat of a running job and updates `fields`.
+
+    Returns:
+        bool: False if the job is no longer running, e.g. because it was
+        failed as stale.
+    """
+    return MigrationJob.objects.filter(id=job_id, status=MigrationJob.RUNNING).update(
+        heartbeat_at=timezone.now(), **fields,
+    ) > 0
+
+
+def _heartbeat(job_id, done):
+    """Refreshes the heartbeat of a running job until `done` is set.
+
+    Runs in its own thread, so a chunk or a count of the source that takes
+    longer than the stale period does not make a live job look abandoned.
+    """
+    interval = settings.MIGRATION_JOB_STALE_SECONDS / 4
+    try:
+        while not done.wait(interval) and _touch(job_id):
+            pass
+    finally:
+        connections.close_all()
+
+
+def run_migration_job(job_id):
+    """Runs the migration for one job and records its progress and outcome.
+
+    Progress reports and the final outcome are only written while the job is
+    still running. If it was failed in the meantime, the migration stops
+    after the chunk it just committed and the job is left as it is.
+
+    Args:
+        job_id (int): The id of the `MigrationJob` to run.
+
+    Returns:
+        MigrationJob | None: The job in its final state, or None if it could
+        not be claimed.
+    """
+    job = _claim(job_id)
+    if job is None:
+        logger.info("Migration job %s was already claimed or failed", job_id)
+        return None
+
+    def report(processed):
+        if not _touch(job.id, processed=processed):
+            raise MigrationStopped(f"Migration job {job.id} is no longer running.")
+
+    done = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat, args=(job.id, done), name=f'quotes-migration-heartbeat-{job.id}',
+        daemon=True,
+    )
+    heartbeat.start()
+    outcome = {'status': MigrationJob.DONE}
+    try:
+        if not _touch(job.id, total=count_source_quotes()):
+            raise MigrationStopped(f"Migration job {job.id} is no longer running.")
+        outcome['processed'] = migrate_data(progress=report)
+    except MigrationStopped:
+        logger.warning("Migration job %s was failed while running; stopped", job.id)
+        outcome = None
+    except Exception as exc:  # pylint: disable=broad-exception-caught
+        logger.exception("Migration job %s failed", job.id)
+        outcome = {'status': MigrationJob.FAILED, 'error': str(exc)}
+    finally:
+        done.set()
+        heartbeat.join()
+
+    if outcome is not None and not _touch(job.id, finished_at=timezone.now(), **outcome):
+        logger.warning("Migration job %s was failed while running; outcome dropped", job.id)
+    job.refresh_from_db()
+    return job
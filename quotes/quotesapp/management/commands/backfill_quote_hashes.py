@@ -0,0 +1,84 @@
+"""Management command that fills in `Quote.content_hash` for existing rows."""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from quotesapp.models import Quote
+from quotesapp.tagstats import link_quote_tags
+# pylint: disable=no-member
+
+QuoteTags = Quote.tags.through
+
+
+class Command(BaseCommand):
+    """Computes missing content hashes in batches.
+
+    Quotes that turn out to duplicate another quote of the same author cannot
+    get a hash (the unique index would reject them), and a quote without one
+    could not be saved again. They are merged into the quote they duplicate:
+    their tags are linked to it through `link_quote_tags`, then they are
+    deleted, so tag counters and co-occurrences stay exact. Each batch is
+    hashed and merged in one transaction.
+
+    Example Usage:
+        ```
+        python manage.py backfill_quote_hashes --batch-size 5000
+        ```
+    """
+    help = "Fills in Quote.content_hash for quotes that do not have one yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        filled = merged = 0
+        last_id = 0
+
+        while True:
+            batch = list(
+                Quote.objects.filter(content_hash__isnull=True, id__gt=last_id)
+                .order_by('id')
+                .only('id', 'author_id', 'text')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            for quote_ in batch:
+                quote_.content_hash = Quote.hash_text(quote_.text)
+            survivors = {
+                (author_id, content_hash): quote_id
+                for author_id, content_hash, quote_id in Quote.objects.filter(
+                    author_id__in={quote_.author_id for quote_ in batch},
+                    content_hash__in={quote_.content_hash for quote_ in batch},
+                ).values_list('author_id', 'content_hash', 'id')
+            }
+
+            unique = []
+            duplicates = {}
+            for quote_ in batch:
+                key = (quote_.author_id, quote_.content_hash)
+                if key in survivors:
+                    duplicates[quote_.id] = survivors[key]
+                else:
+                    survivors[key] = quote_.id
+                    unique.append(quote_)
+
+            with transaction.atomic():
+                Quote.objects.bulk_update(unique, ['content_hash'])
+                if duplicates:
+                    link_quote_tags(
+                        (duplicates[quote_id], tag_id)
+                        for quote_id, tag_id in QuoteTags.objects.filter(
+                            quote_id__in=duplicates,
+                        ).values_list('quote_id', 'tag_id')
+                    )
+                    Quote.objects.filter(id__in=duplicates).delete()
+            filled += len(unique)
+            merged += len(duplicates)
+
+        self.stdout.write(f"Hashed {filled} quotes")
+        if merged:
+            self.stdout.write(self.style.WARNING(
+                f"Merged {merged} duplicate quotes into the quotes they duplicate"
+            ))
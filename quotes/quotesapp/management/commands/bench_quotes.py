@@ -0,0 +1,287 @@
+"""Management command that benchmarks the main views and the migration."""
+import json
+import math
+import random
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from quotesapp.models import Author, Quote, SyncCheckpoint, Tag
+from quotesapp.pagination import FORWARD, encode_cursor
+from quotesapp.seeding import seed_quotes
+# pylint: disable=no-member
+
+SCENARIOS = ('main', 'author_quotes', 'quotes_by_tag', 'quote_create', 'migrate')
+
+BENCH_USERNAME = 'bench'
+
+
+class _QueryCounter:
+    """Execute wrapper counting the statements run on the default database."""
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _percentile(timings, fraction):
+    """Returns the nearest-rank percentile of sorted `timings`."""
+    return timings[min(len(timings) - 1, max(0, math.ceil(len(timings) * fraction) - 1))]
+
+
+def _summary(timings, queries, elapsed):
+    """Summarizes per-request timings (ms) and query counts of one scenario."""
+    timings = sorted(timings)
+    return {
+        'requests': len(timings),
+        'p50_ms': round(_percentile(timings, 0.50), 2),
+        'p95_ms': round(_percentile(timings, 0.95), 2),
+        'p99_ms': round(_percentile(timings, 0.99), 2),
+        'max_ms': round(timings[-1], 2),
+        'queries_per_request': round(sum(queries) / len(queries), 2),
+        'max_queries': max(queries),
+        'throughput_rps': round(len(timings) / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+class Command(BaseCommand):
+    """Measures latency, queries per request and throughput at several sizes.
+
+    For every size in `--sizes` the database is first grown to that many
+    quotes with `seed_quotes` (nothing is ever deleted), then every scenario
+    is driven in-process through the Django test client:
+
+    * `main`, `author_quotes` and `quotes_by_tag` on random pages, authors
+      and tags (the seeded data is skewed, so popular tags are included);
+    * `quote_create`, posting the quote form as a logged-in user;
+    * `migrate`, running `migrate_data` over `--migrate-docs` documents held
+      in `mongomock` (an optional development dependency); it reports
+      documents per second and queries per batch.
+
+    Results can be saved as a JSON baseline and compared against later runs.
+    Run it against a scratch database: it adds quotes, authors, tags and a
+    `bench` user.
+
+    Example Usage:
+        ```
+        python manage.py bench_quotes --sizes 10000,100000 --save bench.json
+        python manage.py bench_quotes --sizes 10000,100000 --compare bench.json
+        ```
+    """
+    help = "Benchmarks the quote views and migrate_data on a seeded database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000',
+                            help="Comma-separated total quote counts to benchmark at.")
+        parser.add_argument('--requests', type=int, default=200,
+                            help="Measured requests per scenario and size.")
+        parser.add_argument('--warmup', type=int, default=20,
+                            help="Unmeasured requests per scenario first.")
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                            help=f"Comma-separated subset of: {', '.join(SCENARIOS)}.")
+        parser.add_argument('--authors', type=int, default=500)
+        parser.add_argument('--tags', type=int, default=200)
+        parser.add_argument('--migrate-docs', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--host', default='localhost',
+                            help="Host header sent by the test client (must be allowed).")
+        parser.add_argument('--save', metavar='PATH', help="Write the results as JSON.")
+        parser.add_argument('--compare', metavar='PATH', help="Compare with a saved baseline.")
+        parser.add_argument('--tolerance', type=float, default=20.0,
+                            help="Percent slowdown of p95 reported as a regression.")
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help="Exit with an error if any regression is found.")
+
+    def handle(self, *args, **options):
+        scenarios = [name for name in options['scenarios'].split(',') if name]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(','))
+        except ValueError as exc:
+            raise CommandError("--sizes must be comma-separated integers.") from exc
+
+        self.rng = random.Random(options['seed'])
+        self.client = Client(HTTP_HOST=options['host'])
+        user, _ = get_user_model().objects.get_or_create(username=BENCH_USERNAME)
+        self.client.force_login(user)
+
+        results = {}
+        for size in sizes:
+            self._grow(size, options)
+            results[str(size)] = {}
+            for scenario in scenarios:
+                if scenario == 'migrate':
+                    summary = self._bench_migrate(options['migrate_docs'])
+                else:
+                    summary = self._bench_requests(scenario, options)
+                if summary is not None:
+                    results[str(size)][scenario] = summary
+                    self._print(size, scenario, summary)
+
+        report = {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'options': {key: options[key] for key in ('requests', 'authors', 'tags', 'seed')},
+            'results': results,
+        }
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Saved results to {options['save']}")
+        if options['compare']:
+            regressions = self._compare(options['compare'], results, options['tolerance'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"{regressions} regression(s) against {options['compare']}")
+
+    def _grow(self, size, options):
+        """Seeds quotes until the database holds at least `size` of them."""
+        missing = size - Quote.objects.count()
+        if missing > 0:
+            self.stdout.write(f"Seeding {missing} quotes to reach {size}...")
+            seed_quotes(missing, options['authors'], options['tags'],
+                        seed=self.rng.randrange(2 ** 32))
+        self.ids = list(Quote.objects.values_list('id', flat=True).order_by('id'))
+        self.author_ids = list(Author.objects.values_list('id', flat=True))
+        self.tag_ids = list(Tag.objects.values_list('id', flat=True))
+
+    def _request(self, scenario):
+        """Sends one request of `scenario` and returns the response."""
+        rng = self.rng
+        if scenario == 'main':
+            cursor = encode_cursor(FORWARD, rng.choice(self.ids)) if rng.random() < 0.8 else ''
+            return self.client.get(reverse('quotesapp:main'), {'cursor': cursor})
+        if scenario == 'author_quotes':
+            return self.client.get(
+                reverse('quotesapp:author_quotes', args=[rng.choice(self.author_ids)])
+            )
+        if scenario == 'quotes_by_tag':
+            return self.client.get(
+                reverse('quotesapp:quotes_by_tag', args=[rng.choice(self.tag_ids)])
+            )
+        return self.client.post(reverse('quotesapp:quote'), {
+            'text': f"Benchmark quote {rng.random()} {time.time_ns()}",
+            'author': rng.choice(self.author_ids),
+            'tags': rng.sample(self.tag_ids, k=min(2, len(self.tag_ids))),
+        })
+
+    def _bench_requests(self, scenario, options):
+        """Drives one view scenario and summarizes its requests."""
+        for _ in range(options['warmup']):
+            self._request(scenario)
+
+        counter = _QueryCounter()
+        timings, queries = [], []
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            for _ in range(options['requests']):
+                before = counter.count
+                request_started = time.perf_counter()
+                response = self._request(scenario)
+                timings.append((time.perf_counter() - request_started) * 1000)
+                queries.append(counter.count - before)
+                if response.status_code >= 400:
+                    raise CommandError(f"{scenario} returned HTTP {response.status_code}")
+        return _summary(timings, queries, time.perf_counter() - started)
+
+    def _bench_migrate(self, docs):
+        """Times `migrate_data` over `docs` documents held in mongomock."""
+        try:
+            import mongomock  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            self.stderr.write("mongomock is not installed; skipping the migrate scenario.")
+            return None
+        # pylint: disable=import-outside-toplevel
+        from quotesapp.filler import Authors, Quotes, migrate_data
+        from quotesapp.sources import close_source, override_source
+
+        saved = list(SyncCheckpoint.objects.values_list('source', 'last_id'))
+        override_source(host='mongodb://localhost', mongo_client_class=mongomock.MongoClient)
+        try:
+            SyncCheckpoint.objects.all().delete()
+            authors = Authors.objects.insert([
+                Authors(fullname=f"Mock Author {self.rng.randrange(10 ** 9)}")
+                for _ in range(max(docs // 20, 1))
+            ])
+            Quotes.objects.insert([
+                Quotes(
+                    quote=f"Mock quote {self.rng.random()} {index}",
+                    author=self.rng.choice(authors),
+                    tags=self.rng.sample(['life', 'love', 'time', 'art', 'truth'], k=2),
+                )
+                for index in range(docs)
+            ])
+
+            counter = _QueryCounter()
+            started = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                migrated = migrate_data(workers=1)
+            elapsed = time.perf_counter() - started
+        finally:
+            SyncCheckpoint.objects.all().delete()
+            SyncCheckpoint.objects.bulk_create(
+                [SyncCheckpoint(source=source, last_id=last_id) for source, last_id in saved]
+            )
+            close_source()
+
+        batches = max(math.ceil(migrated / settings.MIGRATION_BATCH_SIZE), 1)
+        return {
+            'documents': migrated,
+            'seconds': round(elapsed, 2),
+            'throughput_docs_per_s': round(migrated / elapsed, 1) if elapsed > 0 else 0.0,
+            'queries_per_batch': round(counter.count / batches, 1),
+        }
+
+    def _print(self, size, scenario, summary):
+        details = ' '.join(f"{key}={value}" for key, value in summary.items())
+        self.stdout.write(f"[{size}] {scenario}: {details}")
+
+    def _compare(self, path, results, tolerance):
+        """Prints the change of every metric against a saved baseline.
+
+        Returns:
+            int: The number of scenarios whose p95 latency (or migration
+            throughput) got worse by more than `tolerance` percent, or whose
+            maximum queries per request (or per batch) grew.
+        """
+        try:
+            with open(path, encoding='utf-8') as source:
+                baseline = json.load(source)['results']
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f"Cannot read baseline {path}: {exc}") from exc
+
+        regressions = 0
+        for size, scenarios in results.items():
+            for scenario, current in scenarios.items():
+                previous = baseline.get(size, {}).get(scenario)
+                if previous is None:
+                    continue
+                if 'p95_ms' in current:
+                    change = (current['p95_ms'] / max(previous['p95_ms'], 1e-9) - 1) * 100
+                    more_queries = current['max_queries'] > previous['max_queries']
+                    line = (f"p95 {previous['p95_ms']} -> {current['p95_ms']}ms ({change:+.0f}%), "
+                            f"queries {previous['queries_per_request']} -> "
+                            f"{current['queries_per_request']}")
+                    regressed = change > tolerance or more_queries
+                else:
+                    change = (1 - current['throughput_docs_per_s']
+                              / max(previous['throughput_docs_per_s'], 1e-9)) * 100
+                    more_queries = current['queries_per_batch'] > previous['queries_per_batch']
+                    line = (f"docs/s {previous['throughput_docs_per_s']} -> "
+                            f"{current['throughput_docs_per_s']} ({-change:+.0f}%), "
+                            f"queries/batch {previous['queries_per_batch']} -> "
+                            f"{current['queries_per_batch']}")
+                    regressed = change > tolerance or more_queries
+                regressions += regressed
+                flag = " REGRESSION" if regressed else ""
+                self.stdout.write(f"[{size}] {scenario}: {line}{flag}")
+        return regressions
@@ -0,0 +1,94 @@
+"""Management command that benchmarks the multi-tag filter query."""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from quotesapp.models import Tag
+from quotesapp.pagination import keyset_paginate
+from quotesapp.queries import parse_ids, tagged_quote_ids
+# pylint: disable=no-member
+
+
+class Command(BaseCommand):
+    """Times first and deep pages of `tagged_quote_ids` for the given tags.
+
+    Without `--all`/`--any`, the most used tags are picked, so the command
+    shows how the filter behaves on tags with the most quotes (100k+ on a
+    seeded database). The query plan is printed with `--explain`.
+
+    Example Usage:
+        ```
+        python manage.py bench_tag_filter --all 1,5 --runs 50 --explain
+        ```
+    """
+    help = "Benchmarks the /tags/?all=...&any=... query on the current database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', default='', help="Comma-separated tag ids (AND).")
+        parser.add_argument('--any', default='', help="Comma-separated tag ids (OR).")
+        parser.add_argument('--top', type=int, default=2,
+                            help="Use the N most used tags when no ids are given.")
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--pages', type=int, default=10,
+                            help="Number of consecutive pages walked per run.")
+        parser.add_argument('--per-page', type=int, default=20)
+        parser.add_argument('--explain', action='store_true')
+
+    def handle(self, *args, **options):
+        all_ids = parse_ids(options['all'])
+        any_ids = parse_ids(options['any'])
+        if not all_ids and not any_ids:
+            all_ids = self._top_tags(options['top'])
+        if not all_ids and not any_ids:
+            raise CommandError("No tags to benchmark; seed some data first.")
+
+        for tag_id in all_ids + any_ids:
+            count = Tag.quote_set.through.objects.filter(tag_id=tag_id).count()
+            self.stdout.write(f"tag {tag_id}: {count} quotes")
+
+        queryset = tagged_quote_ids(all_ids, any_ids)
+        first, walk = [], []
+        for _ in range(options['runs']):
+            cursor = None
+            for page_no in range(options['pages']):
+                started = time.perf_counter()
+                page = keyset_paginate(queryset, cursor, options['per_page'], key='quote_id')
+                elapsed = (time.perf_counter() - started) * 1000
+                (first if page_no == 0 else walk).append(elapsed)
+                cursor = page.next_cursor
+                if cursor is None:
+                    break
+
+        self._report("first page", first)
+        self._report("next pages", walk)
+
+        if options['explain'] and connection.vendor == 'postgresql':
+            sql, params = queryset.order_by('quote_id')[:options['per_page'] + 1].query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", params)
+                for (line,) in cursor.fetchall():
+                    self.stdout.write(line)
+
+    def _top_tags(self, count):
+        """Returns the ids of the `count` tags with the most quotes."""
+        through = Tag.quote_set.through
+        rows = (
+            through.objects.values('tag_id')
+            .annotate(uses=Count('quote_id'))
+            .order_by('-uses')[:count]
+        )
+        return [row['tag_id'] for row in rows]
+
+    def _report(self, label, timings):
+        """Prints latency percentiles in milliseconds."""
+        if not timings:
+            return
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{label}: n={len(timings)} "
+            f"p50={statistics.median(timings):.2f}ms p95={p95:.2f}ms max={timings[-1]:.2f}ms"
+        )
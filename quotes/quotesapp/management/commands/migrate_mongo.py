@@ -0,0 +1,47 @@
+"""Management command that runs the MongoDB to PostgreSQL migration."""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from quotesapp.filler import count_source_quotes, migrate_data
+
+
+class Command(BaseCommand):
+    """Migrates new quotes from MongoDB, optionally with parallel workers.
+
+    Example Usage:
+        ```
+        python manage.py migrate_mongo --workers 4 --batch-size 2000
+        ```
+    """
+    help = "Migrates quotes, authors and tags from MongoDB to PostgreSQL."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.MIGRATION_WORKERS,
+            help="Number of worker processes (default: MIGRATION_WORKERS).",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.MIGRATION_BATCH_SIZE,
+            help="Documents per chunk (default: MIGRATION_BATCH_SIZE).",
+        )
+
+    def handle(self, *args, **options):
+        total = count_source_quotes()
+        self.stdout.write(f"{total} documents to migrate with {options['workers']} worker(s)")
+        started = time.monotonic()
+
+        def report(processed):
+            self.stdout.write(f"  {processed}/{total}")
+
+        migrated = migrate_data(
+            batch_size=options['batch_size'],
+            progress=report,
+            workers=options['workers'],
+        )
+        elapsed = time.monotonic() - started
+        rate = migrated / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Migrated {migrated} documents in {elapsed:.1f}s ({rate:.0f}/s)"
+        ))
@@ -0,0 +1,25 @@
+"""Management command that rebuilds the tag co-occurrence counts."""
+from django.core.management.base import BaseCommand
+
+from quotesapp.tagstats import rebuild_cooccurrences
+from quotesapp.versions import TAG_CLOUD, bump_versions
+
+
+class Command(BaseCommand):
+    """Recomputes `TagCooccurrence` from the `Quote.tags` through table.
+
+    The counts are maintained incrementally by the ORM signal handlers, the
+    Mongo migration and `import_quotes`; run this after writing tag links
+    with raw SQL, or periodically to repair drift.
+
+    Example Usage:
+        ```
+        python manage.py rebuild_tag_cooccurrences
+        ```
+    """
+    help = "Recomputes the related-tags co-occurrence table in bulk."
+
+    def handle(self, *args, **options):
+        pairs = rebuild_cooccurrences()
+        bump_versions([TAG_CLOUD])
+        self.stdout.write(f"Rebuilt {pairs} tag co-occurrence rows")
@@ -0,0 +1,25 @@
+"""Management command that repairs drift in `Tag.usage_count`."""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from quotesapp.tagstats import reconcile_usage_counts
+
+
+class Command(BaseCommand):
+    """Recomputes tag usage counters from the `Quote.tags` through table.
+
+    The counters are maintained incrementally; this command is meant to run
+    periodically (e.g. nightly from cron) to fix drift caused by writes that
+    bypass the ORM.
+
+    Example Usage:
+        ```
+        python manage.py reconcile_tag_counts
+        ```
+    """
+    help = "Recomputes Tag.usage_count from the Quote.tags through table."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drifted = reconcile_usage_counts()
+        self.stdout.write(f"Fixed {drifted} drifted tag counters")
@@ -0,0 +1,149 @@
+"""Middleware for quotesapp."""
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import instrumentation
+from .routers import begin_request, end_request, has_written
+
+logger = logging.getLogger('quotesapp.requests')
+
+PIN_COOKIE = 'quotes_primary'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class PrimaryPinningMiddleware:
+    """Scopes read-replica routing to a request.
+
+    Every request gets its own routing state (see `quotesapp.routers`).
+    Requests with unsafe methods are pinned to the primary from the start,
+    and any request that wrote sets a short-lived cookie, so the redirect
+    after a form submission, and whatever the client loads right after it,
+    read their own writes from the primary instead of a lagging replica.
+
+    Works in both sync and async middleware chains.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = begin_request(self._pinned(request))
+        try:
+            response = self.get_response(request)
+            return self._process_response(response)
+        finally:
+            end_request(token)
+
+    async def __acall__(self, request):
+        token = begin_request(self._pinned(request))
+        try:
+            response = await self.get_response(request)
+            return self._process_response(response)
+        finally:
+            end_request(token)
+
+    @staticmethod
+    def _pinned(request):
+        return request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES
+
+    @staticmethod
+    def _process_response(response):
+        if has_written():
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class QueryInstrumentationMiddleware:
+    """Reports the SQL and template cost of every request.
+
+    Each response gets a `Server-Timing` header with the SQL time and query
+    count, the template render time and the total time, which browser
+    developer tools show next to the request. A structured log line with the
+    same figures and the slowest statement is written to the
+    `quotesapp.requests` logger, and a warning is logged when a view runs
+    more queries than its budget (`settings.QUERY_BUDGET`, or the view's own
+    `quotesapp.instrumentation.query_budget`).
+
+    With `settings.QUERY_INSTRUMENTATION` off the middleware removes itself
+    from the chain at startup and installs nothing, so it costs nothing.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        instrumentation.install()
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token = instrumentation.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        return self._report(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics, token = instrumentation.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        return self._report(request, response, metrics)
+
+    @staticmethod
+    def _report(request, response, metrics):
+        total_ms = metrics.elapsed() * 1000
+        sql_ms = metrics.sql_time * 1000
+        template_ms = metrics.template_time * 1000
+        response['Server-Timing'] = (
+            f'db;dur={sql_ms:.1f};desc="{metrics.queries} queries", '
+            f'tpl;dur={template_ms:.1f}, '
+            f'total;dur={total_ms:.1f}'
+        )
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else None
+        budget = getattr(match.func, 'query_budget', None) if match else None
+        budget = settings.QUERY_BUDGET if budget is None else budget
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'sql_ms': round(sql_ms, 1),
+            'slowest_ms': round(metrics.slowest_time * 1000, 1),
+            'template_ms': round(template_ms, 1),
+            'total_ms': round(total_ms, 1),
+        }
+        logger.info(
+            ' '.join(f'{key}={value}' for key, value in fields.items()),
+            extra={'metrics': {**fields, 'slowest_sql': metrics.slowest_sql}},
+        )
+        if metrics.queries > budget:
+            logger.warning(
+                "Query budget exceeded: %s ran %d queries (budget %d); slowest %.1fms: %s",
+                view or request.path, metrics.queries, budget,
+                metrics.slowest_time * 1000, metrics.slowest_sql[:500],
+            )
+        return response
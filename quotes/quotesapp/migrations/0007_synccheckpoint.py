@@ -0,0 +1,22 @@
+# Generated by Django 5.1 on 2026-10-17 07:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotesapp', '0006_migrationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=60, unique=True)),
+                ('last_id', models.CharField(max_length=24)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1 on 2026-10-17 07:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotesapp', '0007_synccheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quote',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='quote',
+            constraint=models.UniqueConstraint(fields=('author', 'content_hash'), name='quotesapp_quote_unique_author_hash'),
+        ),
+    ]
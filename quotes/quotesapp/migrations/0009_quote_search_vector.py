@@ -0,0 +1,77 @@
+# Generated by Django 5.1 on 2026-10-17 07:44
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# The stored vector is maintained by triggers rather than by the ORM, so that
+# rows written by bulk_create (migrate_data) or raw SQL are indexed as well.
+# The author's name is looked up from the author row; renaming an author
+# touches their quotes so the vectors are rebuilt.
+CREATE_TRIGGERS = """
+CREATE OR REPLACE FUNCTION quotesapp_quote_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.text, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(
+            (SELECT name FROM quotesapp_author WHERE id = NEW.author_id), ''
+        )), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER quotesapp_quote_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF text, author_id ON quotesapp_quote
+    FOR EACH ROW EXECUTE FUNCTION quotesapp_quote_search_vector_update();
+
+CREATE OR REPLACE FUNCTION quotesapp_author_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    UPDATE quotesapp_quote SET text = text WHERE author_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER quotesapp_author_search_vector_trigger
+    AFTER UPDATE OF name ON quotesapp_author
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION quotesapp_author_search_vector_update();
+
+UPDATE quotesapp_quote SET text = text;
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER IF EXISTS quotesapp_author_search_vector_trigger ON quotesapp_author;
+DROP FUNCTION IF EXISTS quotesapp_author_search_vector_update();
+DROP TRIGGER IF EXISTS quotesapp_quote_search_vector_trigger ON quotesapp_quote;
+DROP FUNCTION IF EXISTS quotesapp_quote_search_vector_update();
+"""
+
+
+def create_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_TRIGGERS)
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_TRIGGERS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotesapp', '0008_quote_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quote',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='quote',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='quotesapp_quote_search_gin'),
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
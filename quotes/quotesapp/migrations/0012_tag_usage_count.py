@@ -0,0 +1,37 @@
+# Generated by Django 5.1 on 2026-10-17 07:48
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_usage(apps, schema_editor):
+    Tag = apps.get_model('quotesapp', 'Tag')
+    through = apps.get_model('quotesapp', 'Quote').tags.through
+    uses = (
+        through.objects.filter(tag_id=OuterRef('id'))
+        .values('tag_id')
+        .annotate(uses=Count('quote_id'))
+        .values('uses')
+    )
+    Tag.objects.update(usage_count=Coalesce(Subquery(uses), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotesapp', '0011_changeversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='usage_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['-usage_count', 'name'], name='quotesapp_tag_usage_idx'),
+        ),
+        migrations.RunPython(count_usage, migrations.RunPython.noop),
+    ]
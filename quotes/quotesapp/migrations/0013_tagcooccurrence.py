@@ -0,0 +1,41 @@
+# Generated by Django 5.1 on 2026-10-17 08:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def count_cooccurrences(apps, schema_editor):
+    connection = schema_editor.connection
+    table = connection.ops.quote_name(apps.get_model('quotesapp', 'TagCooccurrence')._meta.db_table)
+    links = connection.ops.quote_name(apps.get_model('quotesapp', 'Quote').tags.through._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (tag_id, related_id, count) "
+            f"SELECT a.tag_id, b.tag_id, COUNT(*) FROM {links} a "
+            f"JOIN {links} b ON b.quote_id = a.quote_id AND b.tag_id <> a.tag_id "
+            f"GROUP BY a.tag_id, b.tag_id"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotesapp', '0012_tag_usage_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagCooccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='quotesapp.tag')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='quotesapp.tag')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', '-count', 'related'], name='quotesapp_tagco_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tag', 'related'), name='quotesapp_tagcooccurrence_pair_uniq')],
+            },
+        ),
+        migrations.RunPython(count_cooccurrences, migrations.RunPython.noop),
+    ]
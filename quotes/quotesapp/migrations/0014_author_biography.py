@@ -0,0 +1,28 @@
+# Generated by Django 5.1 on 2026-10-17 08:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotesapp', '0013_tagcooccurrence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='born_date',
+            field=models.CharField(blank=True, db_default='', default='', max_length=60),
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='born_location',
+            field=models.CharField(blank=True, db_default='', default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='description',
+            field=models.TextField(blank=True, db_default='', default=''),
+        ),
+    ]
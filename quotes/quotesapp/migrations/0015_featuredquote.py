@@ -0,0 +1,21 @@
+# Generated by Django 5.1 on 2026-10-17 08:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotesapp', '0014_author_biography'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeaturedQuote',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False)),
+                ('quote', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='featured_days', to='quotesapp.quote')),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1 on 2026-10-17 08:32
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fail_orphaned_jobs(apps, schema_editor):
+    """Fails jobs left pending or running by workers that no longer exist.
+
+    The in-process workers of the previous release do not survive the deploy
+    that runs this migration, and at most one active job may remain.
+    """
+    MigrationJob = apps.get_model('quotesapp', 'MigrationJob')
+    MigrationJob.objects.filter(status__in=['pending', 'running']).update(
+        status='failed',
+        error='The worker running this job stopped.',
+        finished_at=timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotesapp', '0015_featuredquote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='migrationjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(fail_orphaned_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='migrationjob',
+            constraint=models.UniqueConstraint(models.Value(True), condition=models.Q(('status__in', ['pending', 'running'])), name='quotesapp_migrationjob_one_active'),
+        ),
+    ]
@@ -1,5 +1,11 @@
 """Models for quotesapp"""
+import hashlib
+import unicodedata
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
 
 
 class Tag(models.Model):
@@ -11,11 +17,21 @@ class Tag(models.Model):
     Attributes:
         name (CharField): The name of the tag, which must be unique and can be
         up to 60 characters long.
+        usage_count (PositiveIntegerField): Denormalized number of quotes
+        carrying the tag, kept up to date incrementally (see
+        `quotesapp.tagstats`) and indexed so the most used tags can be read
+        without aggregating the through table.
 
     Methods:
         __str__: Returns a string representation of the tag, which is its name.
     """
     name = models.CharField(max_length=60, unique=True)
+    usage_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-usage_count', 'name'], name='quotesapp_tag_usage_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name}"
@@ -30,12 +46,23 @@ class Author(models.Model):
     Attributes:
         name (CharField): The name of the author, which must be unique and
         can be up to 120 characters long.
+        born_date (CharField): The birth date as given by the source, e.g.
+        "March 14, 1879"; empty if unknown.
+        born_location (CharField): The birthplace; empty if unknown.
+        description (TextField): A biography, several kilobytes long. It is
+        only needed on the author's own page, so listing queries defer it.
+
+    The biographical fields also have database defaults, so rows inserted
+    with raw SQL by name alone (see `quotesapp.importer`) stay valid.
 
     Methods:
         __str__: Returns a string representation of the author, which is their
             name.
     """
     name = models.CharField(max_length=120, unique=True)
+    born_date = models.CharField(max_length=60, blank=True, default='', db_default='')
+    born_location = models.CharField(max_length=200, blank=True, default='', db_default='')
+    description = models.TextField(blank=True, default='', db_default='')
 
     def __str__(self):
         return f"{self.name}"
@@ -56,14 +83,241 @@ class Quote(models.Model):
             can be up to 3000 characters long.
         tags (ManyToManyField): A list of tags associated with the quote,
             allowing multiple tags to be linked.
+        content_hash (CharField): SHA-256 of the normalized text. Together
+            with `author` it is unique, so checking whether an author already
+            has a quote is a single index probe instead of a text comparison.
+        search_vector (SearchVectorField): Stored `tsvector` over the text
+            (weight A) and the author's name (weight B), GIN-indexed for
+            full-text search. It is maintained by database triggers, so rows
+            written with `bulk_create` or raw SQL are indexed too.
 
     Methods:
         __str__: Returns a string representation of the quote, which includes
             the quote text and the name of the author.
+        hash_text: Returns the content hash of a quote text.
+        save: Refreshes `content_hash` from `text` before saving.
     """
     author = models.ForeignKey(Author, on_delete=models.CASCADE, default=1)
     text = models.CharField(max_length=3000, null=False)
     tags = models.ManyToManyField(Tag)
+    content_hash = models.CharField(max_length=64, null=True, blank=True, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['author', 'content_hash'],
+                name='quotesapp_quote_unique_author_hash',
+            ),
+        ]
+        indexes = [
+            GinIndex(fields=['search_vector'], name='quotesapp_quote_search_gin'),
+        ]
 
     def __str__(self):
         return f"{self.text}\nBy {self.author.name}"
+
+    @staticmethod
+    def hash_text(text):
+        """Returns the content hash of a quote text.
+
+        The text is normalized first (Unicode NFKC, case-folded, surrounding
+        quotation marks stripped and whitespace collapsed), so quotes that
+        differ only in formatting get the same hash.
+
+        Args:
+            text (str): The quote text.
+
+        Returns:
+            str: The hex SHA-256 digest of the normalized text.
+        """
+        normalized = unicodedata.normalize('NFKC', text).casefold()
+        normalized = ' '.join(normalized.split()).strip('"\'\u201c\u201d\u2018\u2019 ')
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    def save(self, *args, **kwargs):
+        self.content_hash = self.hash_text(self.text)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'content_hash'}
+        super().save(*args, **kwargs)
+
+
+class MigrationJob(models.Model):
+    """Represents one run of the MongoDB to PostgreSQL data migration.
+
+    Jobs are created by the `migration` view and executed in the background
+    by the worker in `quotesapp.jobs`. The worker keeps the progress fields up
+    to date after every committed chunk, so the status endpoint can report how
+    far a running migration has got.
+
+    Attributes:
+        status (CharField): One of `pending`, `running`, `done` or `failed`.
+        processed (PositiveIntegerField): Number of source documents migrated
+            so far, including ones that repeat a quote already written.
+        total (PositiveIntegerField): Number of source documents to migrate,
+            known once the job has started.
+        error (TextField): The error message of a failed job.
+        created_at (DateTimeField): When the job was enqueued.
+        started_at (DateTimeField): When the worker picked the job up.
+        heartbeat_at (DateTimeField): When the worker last reported progress.
+            A running job whose heartbeat (or a pending job whose creation)
+            is older than `settings.MIGRATION_JOB_STALE_SECONDS` belongs to a
+            worker that is gone, see `quotesapp.jobs`.
+        finished_at (DateTimeField): When the job finished or failed.
+
+    A partial unique index allows at most one pending or running job, so two
+    concurrent requests cannot both start a migration.
+
+    Methods:
+        throughput: Returns the number of documents migrated per second.
+        as_dict: Returns the job state as a JSON-serializable dictionary.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    ACTIVE = [PENDING, RUNNING]
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    processed = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                models.Value(True),
+                condition=models.Q(status__in=['pending', 'running']),
+                name='quotesapp_migrationjob_one_active',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Migration #{self.id} ({self.status})"
+
+    def throughput(self):
+        """Returns the average number of documents migrated per second."""
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at or timezone.now()
+        elapsed = (end - self.started_at).total_seconds()
+        return round(self.processed / elapsed, 1) if elapsed > 0 else 0.0
+
+    def as_dict(self):
+        """Returns the job state as a JSON-serializable dictionary."""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'processed': self.processed,
+            'total': self.total,
+            'throughput': self.throughput(),
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class SyncCheckpoint(models.Model):
+    """Stores how far the migration has read a MongoDB source collection.
+
+    MongoDB ObjectIds grow monotonically, so the id of the last document
+    written to PostgreSQL is a high-water mark: later runs only read documents
+    with a greater id. The checkpoint is saved in the same transaction as the
+    chunk it covers, so an interrupted run resumes right after the last
+    committed chunk without writing anything twice.
+
+    Attributes:
+        source (CharField): The name of the source collection, e.g. `quotes`.
+        last_id (CharField): The hex ObjectId of the last migrated document.
+        updated_at (DateTimeField): When the checkpoint was last advanced.
+    """
+    source = models.CharField(max_length=60, unique=True)
+    last_id = models.CharField(max_length=24)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} @ {self.last_id}"
+
+
+class ChangeVersion(models.Model):
+    """Records when a part of the quotes catalogue last changed.
+
+    Each row is a scope such as `quotes` (anything shown on the main page),
+    `author:<id>` (an author's page), `tag:<id>` (a tag's page), `authors`
+    (any author name) or `tags` (any tag name). Rows are bumped by the signal
+    handlers in `quotesapp.signals` and by the bulk migration, and read by
+    `quotesapp.versions` to answer conditional requests with a single
+    primary-key lookup instead of running the page's queries.
+
+    Attributes:
+        scope (CharField): The name of the scope; the primary key.
+        changed_at (DateTimeField): When the scope last changed.
+    """
+    scope = models.CharField(max_length=60, primary_key=True)
+    changed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.scope} @ {self.changed_at:%Y-%m-%d %H:%M:%S}"
+
+
+class TagCooccurrence(models.Model):
+    """Counts the quotes that carry two tags together.
+
+    Each pair is stored in both directions, so the tags related to a tag are
+    read with one index range scan on `(tag, -count)`, without joining the
+    `Quote.tags` through table with itself. Rows are kept up to date
+    incrementally (see `quotesapp.tagstats`); pairs no longer shared by any
+    quote are deleted.
+
+    Attributes:
+        tag (ForeignKey): The tag whose related tags the row describes.
+        related (ForeignKey): A tag found on quotes together with `tag`.
+        count (PositiveIntegerField): The number of quotes carrying both.
+    """
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='+')
+    related = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tag', 'related'], name='quotesapp_tagcooccurrence_pair_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['tag', '-count', 'related'], name='quotesapp_tagco_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tag_id} + {self.related_id}: {self.count}"
+
+
+class FeaturedQuote(models.Model):
+    """Records the quote of the day picked for each UTC date.
+
+    The first worker to serve a date picks the quote and stores it here; every
+    other worker then reads the stored pick, so all of them return the same
+    quote however their caches and the quotes table have changed in between.
+    If the quote is deleted, its row goes with it and a new one is picked.
+
+    Attributes:
+        date (DateField): The UTC date; the primary key.
+        quote (ForeignKey): The quote of that day.
+    """
+    date = models.DateField(primary_key=True)
+    quote = models.ForeignKey(Quote, on_delete=models.CASCADE, related_name='featured_days')
+
+    def __str__(self):
+        return f"{self.date}: {self.quote_id}"
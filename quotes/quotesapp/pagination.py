@@ -0,0 +1,264 @@
+"""Keyset (seek) pagination helpers for quotesapp.
+
+Offset pagination (`LIMIT ... OFFSET ...`) makes the database walk and
+discard every skipped row, so deep pages get slower as the table grows.
+Keyset pagination instead remembers the primary key of the last row shown
+and seeks straight to it through the index, so every page costs the same.
+
+Positions are handed to clients as opaque cursors: a direction and an `id`
+packed into a URL-safe token, so templates and API consumers only ever pass
+them back and never build them by hand.
+"""
+import base64
+import binascii
+
+from django.conf import settings
+from django.db.models import Q
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+def encode_cursor(direction, key):
+    """Packs a pagination direction and a row key into an opaque token.
+
+    Args:
+        direction (str): `FORWARD` for rows after `key`, `BACKWARD` for rows
+            before it.
+        key (int | str): The `id` of the row the page starts after (or
+            before), or a composite key for ranked pages.
+
+    Returns:
+        str: A URL-safe cursor token.
+    """
+    raw = f"{direction}:{key}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Unpacks a token produced by `encode_cursor`.
+
+    Malformed or tampered tokens are treated as "no cursor" so a bad link
+    falls back to the first page instead of raising an error.
+
+    Args:
+        token (str | None): The cursor token from the query string.
+
+    Returns:
+        tuple: `(direction, key)`, or `(FORWARD, None)` for the first page.
+    """
+    if not token:
+        return FORWARD, None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, key = base64.urlsafe_b64decode(padded).decode().split(':', 1)
+        key = int(key)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return FORWARD, None
+    if direction not in (FORWARD, BACKWARD):
+        return FORWARD, None
+    return direction, key
+
+
+def get_page_size(request, default=None):
+    """Reads the requested page size, clamped to the configured maximum.
+
+    Args:
+        request (HttpRequest): The request carrying an optional `per_page`
+            GET parameter.
+        default (int, optional): Page size to use when none is requested.
+            Defaults to `settings.QUOTES_PAGE_SIZE`.
+
+    Returns:
+        int: A page size between 1 and `settings.QUOTES_MAX_PAGE_SIZE`.
+    """
+    default = default or settings.QUOTES_PAGE_SIZE
+    try:
+        size = int(request.GET.get('per_page', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, settings.QUOTES_MAX_PAGE_SIZE))
+
+
+def _row_key(row, key):
+    """Returns the keyset column of a model instance or a `values()` row."""
+    return row[key] if isinstance(row, dict) else getattr(row, key)
+
+
+class KeysetPage:
+    """A single page of results produced by `keyset_paginate`.
+
+    Attributes:
+        object_list (list): The objects on this page, in ascending key order.
+        has_next (bool): True if there are rows after this page.
+        has_previous (bool): True if there are rows before this page.
+        next_cursor (str | None): The cursor of the next page.
+        previous_cursor (str | None): The cursor of the previous page.
+        per_page (int): The page size used to build this page.
+    """
+    def __init__(self, object_list, has_next, has_previous, per_page, key='id'):
+        self.object_list = object_list
+        self.has_next = has_next and bool(object_list)
+        self.has_previous = has_previous and bool(object_list)
+        self.per_page = per_page
+        self.next_cursor = (
+            encode_cursor(FORWARD, _row_key(object_list[-1], key)) if self.has_next else None
+        )
+        self.previous_cursor = (
+            encode_cursor(BACKWARD, _row_key(object_list[0], key)) if self.has_previous else None
+        )
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def keyset_paginate(queryset, cursor=None, per_page=None, key='id'):
+    """Returns one page of `queryset` ordered by `key` using keyset pagination.
+
+    One more row than requested is fetched to find out whether another page
+    exists in the direction of travel, so a page costs exactly one query for
+    the rows plus whatever `prefetch_related` lookups the queryset carries.
+
+    Args:
+        queryset (QuerySet): The queryset to paginate. Any ordering is
+            replaced by ordering on `key`.
+        cursor (str, optional): An opaque cursor from a previous page. The
+            first page is returned when it is missing or invalid.
+        per_page (int, optional): Page size. Defaults to
+            `settings.QUOTES_PAGE_SIZE`.
+        key (str, optional): A unique, indexed integer column to paginate
+            on. Defaults to `id`; `values()` querysets over a through table
+            can use e.g. `quote_id`.
+
+    Returns:
+        KeysetPage: The requested page.
+    """
+    per_page = per_page or settings.QUOTES_PAGE_SIZE
+    direction, position, rows = _keyset_query(queryset, cursor, per_page, key)
+    return _keyset_page(list(rows), direction, position, per_page, key)
+
+
+async def akeyset_paginate(queryset, cursor=None, per_page=None, key='id'):
+    """Async version of `keyset_paginate`, for views served over ASGI."""
+    per_page = per_page or settings.QUOTES_PAGE_SIZE
+    direction, position, rows = _keyset_query(queryset, cursor, per_page, key)
+    return _keyset_page([row async for row in rows], direction, position, per_page, key)
+
+
+def _keyset_query(queryset, cursor, per_page, key):
+    """Builds the unevaluated query for the page selected by `cursor`.
+
+    Returns:
+        tuple: `(direction, position, rows)`, where `rows` fetches one more
+        row than `per_page` to find out whether another page exists in the
+        direction of travel.
+    """
+    direction, position = decode_cursor(cursor)
+    if direction == BACKWARD:
+        rows = queryset.filter(**{f'{key}__lt': position}).order_by(f'-{key}')
+    else:
+        if position is not None:
+            queryset = queryset.filter(**{f'{key}__gt': position})
+        rows = queryset.order_by(key)
+    return direction, position, rows[:per_page + 1]
+
+
+def _keyset_page(rows, direction, position, per_page, key):
+    """Builds the `KeysetPage` from the rows fetched by `_keyset_query`."""
+    if direction == BACKWARD:
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page]
+        rows.reverse()
+        return KeysetPage(
+            rows, has_next=True, has_previous=has_previous, per_page=per_page, key=key
+        )
+
+    has_next = len(rows) > per_page
+    return KeysetPage(
+        rows[:per_page], has_next=has_next, has_previous=position is not None,
+        per_page=per_page, key=key,
+    )
+
+
+def paginate_request(request, queryset, default_size=None, key='id'):
+    """Paginates `queryset` using the `cursor` and `per_page` GET parameters.
+
+    Args:
+        request (HttpRequest): The request carrying the pagination parameters.
+        queryset (QuerySet): The queryset to paginate.
+        default_size (int, optional): Page size to use when the request does
+            not ask for one.
+        key (str, optional): The column to paginate on. Defaults to `id`.
+
+    Returns:
+        KeysetPage: The requested page.
+    """
+    return keyset_paginate(
+        queryset,
+        cursor=request.GET.get('cursor'),
+        per_page=get_page_size(request, default_size),
+        key=key,
+    )
+
+
+async def apaginate_request(request, queryset, default_size=None, key='id'):
+    """Async version of `paginate_request`."""
+    return await akeyset_paginate(
+        queryset,
+        cursor=request.GET.get('cursor'),
+        per_page=get_page_size(request, default_size),
+        key=key,
+    )
+
+
+class RankedPage(KeysetPage):
+    """A page of ranked results produced by `ranked_paginate`.
+
+    Ranked results are ordered by `(-rank, id)`, so the cursor carries both
+    the rank and the id of the last row. Only forward navigation is offered.
+    """
+    def __init__(self, object_list, has_next, per_page):
+        super().__init__(object_list, has_next=has_next, has_previous=False, per_page=per_page)
+        if self.has_next:
+            last = object_list[-1]
+            self.next_cursor = encode_cursor(FORWARD, f"{last.rank!r}:{last.id}")
+
+
+def ranked_paginate(queryset, cursor=None, per_page=None):
+    """Returns one page of a queryset annotated with `rank`, best first.
+
+    Args:
+        queryset (QuerySet): A queryset with a `rank` annotation.
+        cursor (str, optional): An opaque cursor from a previous page.
+        per_page (int, optional): Page size. Defaults to
+            `settings.QUOTES_PAGE_SIZE`.
+
+    Returns:
+        RankedPage: The requested page.
+    """
+    per_page = per_page or settings.QUOTES_PAGE_SIZE
+    position = _decode_ranked_cursor(cursor)
+    if position is not None:
+        rank, key = position
+        queryset = queryset.filter(Q(rank__lt=rank) | Q(rank=rank, id__gt=key))
+    rows = list(queryset.order_by('-rank', 'id')[:per_page + 1])
+    return RankedPage(rows[:per_page], has_next=len(rows) > per_page, per_page=per_page)
+
+
+def _decode_ranked_cursor(token):
+    """Unpacks a `RankedPage` cursor into `(rank, id)`, or None."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, rank, key = base64.urlsafe_b64decode(padded).decode().split(':', 2)
+        position = float(rank), int(key)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    return position if direction == FORWARD else None
@@ -0,0 +1,114 @@
+"""Author profile statistics: quote count and most used tags.
+
+The statistics of an author are computed with a single query: the quote
+count and the top tags (as a JSON array built by `ARRAY(SELECT ...)`) are
+both correlated subqueries annotated on the author's row, served by the
+`(author, content_hash)` and through-table indexes. Other databases than
+PostgreSQL read the tags with a second query.
+
+Results are cached under a key made of the versions of the author's scope
+and of tag names (see `quotesapp.versions`), which are bumped whenever one of
+the author's quotes, their tags, or a tag name changes, so a cached profile
+is never stale and needs no explicit invalidation.
+"""
+from django.conf import settings
+from django.contrib.postgres.expressions import ArraySubquery
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce, JSONObject
+
+from .models import Author, Quote
+from .versions import TAGS, arequest_versions, author_scope, request_versions
+# pylint: disable=no-member
+
+QuoteTags = Quote.tags.through
+
+PROFILE_KEY = 'quotes:author-profile:{}:{}'
+PROFILE_TIMEOUT = 24 * 60 * 60
+
+
+def _top_tags(author_id):
+    """Returns the `(tag_id, name, uses)` rows of an author's most used tags."""
+    return (
+        QuoteTags.objects.filter(quote__author_id=author_id)
+        .values('tag_id', 'tag__name')
+        .annotate(uses=Count('quote_id'))
+        .order_by('-uses', 'tag__name')[:settings.AUTHOR_PROFILE_TOP_TAGS]
+    )
+
+
+def _profile_query(author_id):
+    quote_count = (
+        Quote.objects.filter(author_id=OuterRef('id'))
+        .order_by()
+        .values('author_id')
+        .annotate(quotes=Count('id'))
+        .values('quotes')
+    )
+    row = Author.objects.filter(id=author_id).annotate(
+        quote_count=Coalesce(Subquery(quote_count), 0),
+    )
+    if connection.vendor == 'postgresql':
+        top_tags = _top_tags(OuterRef('id')).values(
+            json=JSONObject(id='tag_id', name='tag__name', count='uses'),
+        )
+        row = row.annotate(top_tags=ArraySubquery(top_tags))
+        return row.values('quote_count', 'top_tags')
+    return row.values('quote_count')
+
+
+def _tag_dicts(rows):
+    return [{'id': row['tag_id'], 'name': row['tag__name'], 'count': row['uses']}
+            for row in rows]
+
+
+def _key(author_id, versions):
+    state = '-'.join(
+        f"{versions[scope].timestamp():.6f}" for scope in (author_scope(author_id), TAGS)
+    )
+    return PROFILE_KEY.format(author_id, state)
+
+
+def _profile(row, tags=None):
+    """Builds the profile from a `_profile_query` row and, if needed, tag rows."""
+    return {
+        'quote_count': row['quote_count'],
+        'top_tags': row['top_tags'] if tags is None else _tag_dicts(tags),
+    }
+
+
+def author_profile(request, author_id):
+    """Returns the profile statistics of an author, cached until they change.
+
+    Args:
+        request (HttpRequest): The request being served; versions already
+            loaded for it by `versioned` are reused for the cache key.
+        author_id (int): The author, which must exist.
+
+    Returns:
+        dict: `quote_count` and `top_tags`, a list of `{id, name, count}`
+        of the author's most used tags, most used first.
+    """
+    versions = request_versions(request, [author_scope(author_id), TAGS])
+    key = _key(author_id, versions)
+    profile = cache.get(key)
+    if profile is None:
+        row = _profile_query(author_id).get()
+        tags = None if 'top_tags' in row else list(_top_tags(author_id))
+        profile = _profile(row, tags)
+        cache.set(key, profile, PROFILE_TIMEOUT)
+    return profile
+
+
+async def aauthor_profile(request, author_id):
+    """Async version of `author_profile`."""
+    versions = await arequest_versions(request, [author_scope(author_id), TAGS])
+    key = _key(author_id, versions)
+    profile = await cache.aget(key)
+    if profile is None:
+        row = await _profile_query(author_id).aget()
+        tags = None if 'top_tags' in row else [tag async for tag in _top_tags(author_id)]
+        profile = _profile(row, tags)
+        await cache.aset(key, profile, PROFILE_TIMEOUT)
+    return profile
@@ -0,0 +1,59 @@
+"""Reusable, set-based queries over the quotes schema."""
+from django.db.models import Count
+
+from .models import Quote
+# pylint: disable=no-member
+
+
+def parse_ids(value):
+    """Parses a comma-separated list of ids such as `1,5,9`.
+
+    Args:
+        value (str | None): The raw query string value.
+
+    Returns:
+        list[int]: The distinct valid ids, in the order given.
+    """
+    ids = []
+    for part in (value or '').split(','):
+        part = part.strip()
+        if part.isdigit() and int(part) not in ids:
+            ids.append(int(part))
+    return ids
+
+
+def tagged_quote_ids(all_tags=(), any_tags=()):
+    """Returns the ids of quotes matching a multi-tag filter.
+
+    The filter runs entirely on the `Quote.tags` through table: rows for the
+    requested tags are grouped by `quote_id`, and for `all_tags` only groups
+    with one row per requested tag are kept (`HAVING count(*) = n`). That is a
+    single grouped scan of the `(tag_id, quote_id)` index however many tags
+    are combined, instead of one join per tag.
+
+    Args:
+        all_tags (list[int]): Quotes must carry every one of these tags.
+        any_tags (list[int]): Quotes must carry at least one of these tags.
+
+    Returns:
+        QuerySet: A `values()` queryset of `{'quote_id': ...}` rows. Order and
+            paginate it on `quote_id`.
+    """
+    through = Quote.tags.through
+    if all_tags:
+        matches = (
+            through.objects.filter(tag_id__in=all_tags)
+            .values('quote_id')
+            .annotate(matched=Count('tag_id'))
+            .filter(matched=len(all_tags))
+        )
+        if any_tags:
+            matches = matches.filter(
+                quote_id__in=through.objects.filter(tag_id__in=any_tags).values('quote_id')
+            )
+        return matches
+    return (
+        through.objects.filter(tag_id__in=any_tags)
+        .values('quote_id')
+        .annotate(matched=Count('tag_id'))
+    )
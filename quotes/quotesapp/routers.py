@@ -0,0 +1,183 @@
+"""Routing of reads to PostgreSQL read replicas.
+
+Replicas are declared in `settings.DATABASE_REPLICAS` (aliases of extra
+`DATABASES` entries). `ReplicaRouter` sends reads to them in round-robin
+order and everything else to `default`. Reads stay on the primary when they
+could observe replication lag:
+
+* inside a transaction on the primary, so read-modify-write code sees its
+  own rows;
+* for the rest of a request (or `pin_primary` block) once it has written;
+* for requests pinned by `quotesapp.middleware.PrimaryPinningMiddleware`,
+  i.e. unsafe methods and requests shortly after the client wrote.
+
+A replica that cannot be connected to is skipped for
+`settings.DATABASE_REPLICA_RETRY_SECONDS`; with no replica available reads
+fall back to the primary.
+"""
+import contextvars
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingState:
+    """Per-request routing state, shared by reference across the request.
+
+    The state object is stored in a context variable and mutated in place,
+    so a write made in a `sync_to_async` thread still pins the rest of the
+    request, although context variable assignments there do not propagate
+    back.
+
+    Attributes:
+        pinned (bool): True once reads must go to the primary.
+        wrote (bool): True once the request has written to the primary.
+    """
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = contextvars.ContextVar('quotesapp_routing_state', default=None)
+
+_lock = threading.Lock()
+_down_until = {}
+_cycle = None
+
+
+def begin_request(pinned=False):
+    """Starts a fresh routing state for the current request.
+
+    Returns:
+        contextvars.Token: The token to pass to `end_request`.
+    """
+    return _state.set(RoutingState(pinned))
+
+
+def end_request(token):
+    """Restores the routing state saved by `begin_request`."""
+    _state.reset(token)
+
+
+def is_pinned():
+    """Returns True if reads of the current context go to the primary."""
+    state = _state.get()
+    return state is not None and state.pinned
+
+
+def has_written():
+    """Returns True if the current request has written to the primary."""
+    state = _state.get()
+    return state is not None and state.wrote
+
+
+def mark_written():
+    """Pins the current request to the primary after it has written."""
+    state = _state.get()
+    if state is not None:
+        state.pinned = state.wrote = True
+
+
+@contextmanager
+def pin_primary():
+    """Sends every query of the block to the primary.
+
+    Example Usage:
+        ```python
+        with pin_primary():
+            migrate_data()
+        ```
+    """
+    token = begin_request(pinned=True)
+    try:
+        yield
+    finally:
+        end_request(token)
+
+
+def _replicas():
+    """Returns the round-robin iterator over the configured replicas."""
+    global _cycle  # pylint: disable=global-statement
+    with _lock:
+        if _cycle is None:
+            _cycle = itertools.cycle(settings.DATABASE_REPLICAS)
+        return _cycle
+
+
+@receiver(setting_changed)
+def _reset_replicas(setting, **kwargs):  # pylint: disable=unused-argument
+    """Restarts the rotation when tests override `DATABASE_REPLICAS`."""
+    global _cycle  # pylint: disable=global-statement
+    if setting == 'DATABASE_REPLICAS':
+        with _lock:
+            _cycle = None
+            _down_until.clear()
+
+
+def _available(alias):
+    """Returns True if `alias` is not marked down and can be connected to."""
+    if _down_until.get(alias, 0) > time.monotonic():
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        logger.warning("Read replica %r is unavailable, using the next one", alias)
+        _down_until[alias] = time.monotonic() + settings.DATABASE_REPLICA_RETRY_SECONDS
+        return False
+    return True
+
+
+def choose_replica():
+    """Returns the next available replica alias, or the primary alias.
+
+    Returns:
+        str: A replica alias in round-robin order, or `default` if no replica
+        is configured or none can be reached.
+    """
+    if not settings.DATABASE_REPLICAS:
+        return DEFAULT_DB_ALIAS
+    replicas = _replicas()
+    for _ in settings.DATABASE_REPLICAS:
+        alias = next(replicas)
+        if _available(alias):
+            return alias
+    return DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """Database router sending safe reads to replicas and writes to `default`.
+
+    Enable it with:
+
+        ```python
+        DATABASE_ROUTERS = ['quotesapp.routers.ReplicaRouter']
+        ```
+    """
+    def db_for_read(self, model, **hints):  # pylint: disable=unused-argument
+        """Returns a replica for the read unless it must see the primary."""
+        if is_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return choose_replica()
+
+    def db_for_write(self, model, **hints):  # pylint: disable=unused-argument
+        """Returns the primary and pins the rest of the request to it."""
+        mark_written()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):  # pylint: disable=unused-argument
+        """Allows relations between objects of the primary and its replicas."""
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        return obj1._state.db in databases and obj2._state.db in databases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):  # pylint: disable=unused-argument
+        """Migrates the primary only; replicas receive the schema by replication."""
+        return db not in settings.DATABASE_REPLICAS
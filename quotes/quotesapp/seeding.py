@@ -0,0 +1,148 @@
+"""Synthetic, realistically skewed quotes data for benchmarks and checks.
+
+Real catalogues are far from uniform: a few authors wrote most quotes and a
+few tags are on most of them. The seeder draws authors and tags from a
+Zipf-like distribution (weight `1 / rank ** SKEW`), so popular tag pages get
+tens of thousands of quotes while the long tail has a handful, which is
+where N+1 queries and missing indexes show up.
+
+Rows are written with `bulk_create` in batches, quotes upserted on their
+`(author, content_hash)` key like the Mongo migration, so seeding can be
+repeated to grow a database. Never seed a production database.
+"""
+import itertools
+import random
+
+from django.db import transaction
+
+from .models import Author, Quote, Tag
+from .streaming import chunked
+from .tagstats import link_quote_tags
+from .versions import QUOTES, TAG_CLOUD, author_scope, bump_versions, tag_scope
+# pylint: disable=no-member
+
+SKEW = 1.1
+MAX_TAGS_PER_QUOTE = 4
+SEED_BATCH_SIZE = 5000
+
+WORDS = (
+    "life love time world mind heart truth dream light hope fear courage "
+    "friend silence wisdom art freedom change future past moment nothing "
+    "everything people power money success failure happiness beauty death "
+    "knowledge imagination music book word reason faith chance choice always "
+    "never only simply must cannot becomes remember forget learn begin end "
+    "is are was be have make give take find keep lose know believe want"
+).split()
+
+FIRST_NAMES = (
+    "Ada Alan Albert Anna Boris Clara David Emily Frida George Hannah Isaac "
+    "Jane Karl Lesya Marie Mark Nina Oscar Pablo Rosa Simone Taras Virginia"
+).split()
+LAST_NAMES = (
+    "Austen Curie Darwin Einstein Franko Hugo Kahlo Kafka Lovelace Marx Orwell "
+    "Picasso Seneca Shevchenko Tolstoy Turing Twain Ukrainka Voltaire Woolf"
+).split()
+
+
+def _cumulative_weights(count):
+    """Returns cumulative Zipf-like weights for `count` ranked items."""
+    return list(itertools.accumulate(1 / rank ** SKEW for rank in range(1, count + 1)))
+
+
+def _author_names(count):
+    """Returns `count` distinct, human-looking author names."""
+    names = [f"{first} {last}" for last in LAST_NAMES for first in FIRST_NAMES]
+    if count <= len(names):
+        return names[:count]
+    return names + [f"{names[i % len(names)]} {i // len(names) + 1}"
+                    for i in range(len(names), count)]
+
+
+def _tag_names(count):
+    """Returns `count` distinct tag names, common words first."""
+    return [WORDS[i] if i < len(WORDS) else f"{WORDS[i % len(WORDS)]}-{i // len(WORDS)}"
+            for i in range(count)]
+
+
+def _sentence(rng):
+    words = rng.choices(WORDS, k=rng.randint(6, 24))
+    return ' '.join(words).capitalize() + rng.choice('..!?')
+
+
+def _upsert(model, names):
+    """Inserts missing rows by name and returns their ids, in `names` order."""
+    for batch in chunked(names, SEED_BATCH_SIZE):
+        model.objects.bulk_create([model(name=name) for name in batch], ignore_conflicts=True)
+    ids = {}
+    for batch in chunked(names, SEED_BATCH_SIZE):
+        ids.update(model.objects.filter(name__in=batch).values_list('name', 'id'))
+    return [ids[name] for name in names]
+
+
+def seed_quotes(quotes, authors, tags, seed=None, batch_size=None, progress=None):
+    """Adds `quotes` synthetic quotes by `authors` authors with `tags` tags.
+
+    Each batch of quotes and its tag links is written in its own
+    transaction; links go through `link_quote_tags`, so tag usage counters
+    stay exact, and change versions and cached cards are refreshed.
+
+    Args:
+        quotes (int): Number of quotes to generate.
+        authors (int): Number of distinct authors to draw from.
+        tags (int): Number of distinct tags to draw from.
+        seed (int, optional): Random seed, for reproducible data sets.
+        batch_size (int, optional): Quotes per `bulk_create`. Defaults to
+            `SEED_BATCH_SIZE`.
+        progress (callable, optional): Called with the running number of
+            quotes written after every batch.
+
+    Returns:
+        dict: The number of `quotes` written and of tag `links` created.
+    """
+    rng = random.Random(seed)
+    batch_size = batch_size or SEED_BATCH_SIZE
+    author_ids = _upsert(Author, _author_names(max(authors, 1)))
+    tag_ids = _upsert(Tag, _tag_names(max(tags, 1))) if tags else []
+    author_weights = _cumulative_weights(len(author_ids))
+    tag_weights = _cumulative_weights(len(tag_ids))
+
+    written = links = 0
+    for batch in chunked(range(quotes), batch_size):
+        rows = {}
+        for _ in batch:
+            text = _sentence(rng)
+            author_id = rng.choices(author_ids, cum_weights=author_weights)[0]
+            content_hash = Quote.hash_text(text)
+            quote_tags = set(rng.choices(
+                tag_ids, cum_weights=tag_weights, k=rng.randint(0, MAX_TAGS_PER_QUOTE),
+            )) if tag_ids else set()
+            rows[(author_id, content_hash)] = (
+                Quote(text=text, author_id=author_id, content_hash=content_hash), quote_tags,
+            )
+
+        # Upserted in key order, so concurrent seeders cannot deadlock.
+        rows = dict(sorted(rows.items()))
+        with transaction.atomic():
+            created = Quote.objects.bulk_create(
+                [quote for quote, _ in rows.values()],
+                update_conflicts=True,
+                unique_fields=['author', 'content_hash'],
+                update_fields=['text'],
+            )
+            linked = link_quote_tags(
+                (quote.id, tag_id)
+                for quote, (_, quote_tags) in zip(created, rows.values())
+                for tag_id in quote_tags
+            )
+            bump_versions(
+                [QUOTES, TAG_CLOUD]
+                + [author_scope(quote.author_id) for quote in created]
+                + [tag_scope(tag_id) for _, tag_id in linked]
+            )
+
+        written += len(created)
+        links += len(linked)
+        if progress is not None:
+            progress(written)
+
+    return {'quotes': written, 'links': links}
@@ -0,0 +1,136 @@
+"""Signal handlers that keep derived data in step with the quotes models.
+
+Every change bumps the change versions of the pages that show it
+(`quotesapp.versions`), which also retires the affected quote cards, since
+their cache keys are made of those versions (`quotesapp.cards`), and keeps
+the tag usage counters and co-occurrence counts (`quotesapp.tagstats`) exact.
+Connected in `QuotesappConfig.ready`. Bulk writes that bypass model signals
+(`bulk_create`, raw SQL) must do the same explicitly, as `migrate_data` does.
+"""
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Author, Quote, Tag
+from .tagstats import (
+    adjust_cooccurrences, adjust_usage_counts, cooccurrence_deltas, quote_tag_sets,
+)
+from .versions import AUTHORS, QUOTES, TAGS, author_scope, bump_versions, tag_scope
+# pylint: disable=no-member,unused-argument
+
+QuoteTags = Quote.tags.through
+
+
+def _quote_tag_ids(quote_ids):
+    return set(
+        QuoteTags.objects.filter(quote_id__in=quote_ids).values_list('tag_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Quote)
+@receiver(pre_delete, sender=Quote)
+def quote_changed(sender, instance, created=False, **kwargs):
+    """Handles a saved quote, or a quote about to be deleted.
+
+    The pre-delete hook runs while the quote's tag links still exist, so the
+    pages of its tags can be bumped too. A quote just created has no tag
+    links yet; its tags are bumped by `quote_tags_changed` once added.
+    """
+    tag_ids = () if created else _quote_tag_ids([instance.id])
+    bump_versions([QUOTES, author_scope(instance.author_id), *map(tag_scope, tag_ids)])
+
+
+@receiver(pre_delete, sender=Quote)
+def quote_deleting(sender, instance, **kwargs):
+    """Releases the tags of a quote about to be deleted.
+
+    The cascade removes the quote's tag links without an `m2m_changed`
+    signal, so the usage counters and co-occurrences are decremented here.
+    """
+    tag_ids = _quote_tag_ids([instance.id])
+    adjust_usage_counts(dict.fromkeys(tag_ids, -1))
+    adjust_cooccurrences(cooccurrence_deltas([(tag_ids, tag_ids)], -1))
+
+
+@receiver(post_save, sender=Author)
+def author_changed(sender, instance, created, **kwargs):
+    """Handles a renamed author, whose name shows on many pages."""
+    if not created:
+        bump_versions([QUOTES, AUTHORS, author_scope(instance.id)])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_changed(sender, instance, created=False, **kwargs):
+    """Handles a renamed tag, or a tag about to be deleted."""
+    if not created:
+        bump_versions([QUOTES, TAGS, tag_scope(instance.id)])
+
+
+@receiver(m2m_changed, sender=QuoteTags)
+def quote_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Handles tags being added to, removed from or cleared off quotes.
+
+    Changes made from the quote side (`quote.tags.add(...)`) affect one quote
+    and the tags in `pk_set`; changes made from the tag side
+    (`tag.quote_set.add(...)`) affect one tag and the quotes in `pk_set`.
+
+    Usage counters and co-occurrences are adjusted by the links that really
+    change: Django only reports new links in `post_add`, while removals and
+    clears are counted against the existing links before they are deleted.
+    All of this runs in the transaction of the add/remove/clear itself; the
+    version bumps are written once it commits.
+    """
+    if not reverse:
+        _quote_side_changed(instance, action, pk_set)
+    else:
+        _tag_side_changed(instance, action, pk_set)
+
+
+def _quote_side_changed(quote_, action, pk_set):
+    if action == 'post_add':
+        adjust_usage_counts(dict.fromkeys(pk_set, 1))
+        tag_ids = _quote_tag_ids([quote_.id])
+        adjust_cooccurrences(cooccurrence_deltas([(tag_ids, pk_set)], 1))
+    elif action in ('pre_remove', 'pre_clear'):
+        tag_ids = _quote_tag_ids([quote_.id])
+        removed = tag_ids & set(pk_set) if action == 'pre_remove' else tag_ids
+        adjust_usage_counts(dict.fromkeys(removed, -1))
+        adjust_cooccurrences(cooccurrence_deltas([(tag_ids, removed)], -1))
+        if action == 'pre_clear':
+            pk_set = removed
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    bump_versions([
+        QUOTES,
+        author_scope(quote_.author_id),
+        *map(tag_scope, pk_set),
+    ])
+
+
+def _tag_side_changed(tag_, action, pk_set):
+    if action == 'post_add':
+        adjust_usage_counts({tag_.id: len(pk_set)})
+        tags = quote_tag_sets(pk_set)
+        adjust_cooccurrences(cooccurrence_deltas(
+            ((tags[quote_id], {tag_.id}) for quote_id in pk_set), 1,
+        ))
+    elif action in ('pre_remove', 'pre_clear'):
+        linked = QuoteTags.objects.filter(tag_id=tag_.id)
+        if action == 'pre_remove':
+            linked = linked.filter(quote_id__in=pk_set)
+        quote_ids = list(linked.values_list('quote_id', flat=True))
+        adjust_usage_counts({tag_.id: -len(quote_ids)})
+        tags = quote_tag_sets(quote_ids)
+        adjust_cooccurrences(cooccurrence_deltas(
+            ((tags[quote_id], {tag_.id}) for quote_id in quote_ids), -1,
+        ))
+        if action == 'pre_clear':
+            pk_set = quote_ids
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    author_ids = set(
+        Quote.objects.filter(id__in=pk_set).values_list('author_id', flat=True)
+    )
+    bump_versions([QUOTES, tag_scope(tag_.id), *map(author_scope, author_ids)])
@@ -0,0 +1,100 @@
+"""Lazy, pooled connection to the MongoDB source of the data migration.
+
+Nothing here talks to MongoDB at import time. The connection settings are
+registered with mongoengine the first time the migration asks for the source,
+and mongoengine opens a single pooled `MongoClient` for the alias on first
+query. That client is then reused by every later migration run in the same
+process, so web workers that never migrate never pay for SRV resolution or a
+connection to Atlas.
+"""
+import threading
+
+from django.conf import settings
+from mongoengine import register_connection, disconnect
+from mongoengine.connection import get_db
+
+SOURCE_ALIAS = 'source'
+
+_lock = threading.Lock()
+_registered = False
+
+
+def _source_uri(config):
+    """Builds the MongoDB connection string from `settings.MONGO_SOURCE`."""
+    if config.get('URI'):
+        return config['URI']
+    return (
+        f"mongodb+srv://{config['USER']}:{config['PASSWORD']}@{config['DOMAIN']}"
+        f"/{config['NAME']}?retryWrites=true&w=majority"
+    )
+
+
+def ensure_source():
+    """Registers the source connection with mongoengine if not done yet.
+
+    Registration is cheap and does not open a socket; the pooled client is
+    created by mongoengine on the first query against `SOURCE_ALIAS`.
+
+    Returns:
+        str: The mongoengine alias of the source connection.
+    """
+    global _registered  # pylint: disable=global-statement
+    with _lock:
+        if not _registered:
+            config = settings.MONGO_SOURCE
+            register_connection(
+                SOURCE_ALIAS,
+                host=_source_uri(config),
+                maxPoolSize=config['MAX_POOL_SIZE'],
+                connectTimeoutMS=config['CONNECT_TIMEOUT_MS'],
+                serverSelectionTimeoutMS=config['SERVER_SELECTION_TIMEOUT_MS'],
+                socketTimeoutMS=config['SOCKET_TIMEOUT_MS'],
+            )
+            _registered = True
+    return SOURCE_ALIAS
+
+
+def get_source_db():
+    """Returns the pymongo database of the migration source.
+
+    Returns:
+        pymongo.database.Database: The source database, backed by the shared
+            pooled client.
+    """
+    return get_db(ensure_source())
+
+
+def close_source():
+    """Closes the pooled source client and forgets its registration.
+
+    The next call to `ensure_source` registers the connection again. This is
+    needed after forking, since a `MongoClient` must not be shared between
+    processes.
+    """
+    global _registered  # pylint: disable=global-statement
+    with _lock:
+        if _registered:
+            disconnect(SOURCE_ALIAS)
+            _registered = False
+
+
+def override_source(**connection_kwargs):
+    """Registers the source with explicit mongoengine connection arguments.
+
+    Used by benchmarks to migrate from an in-memory `mongomock` client instead
+    of the configured MongoDB. Call `close_source` afterwards to go back to
+    `settings.MONGO_SOURCE`.
+
+    Args:
+        **connection_kwargs: Passed to `mongoengine.register_connection`,
+            e.g. `host` and `mongo_client_class`.
+
+    Returns:
+        str: The mongoengine alias of the source connection.
+    """
+    global _registered  # pylint: disable=global-statement
+    close_source()
+    with _lock:
+        register_connection(SOURCE_ALIAS, **connection_kwargs)
+        _registered = True
+    return SOURCE_ALIAS
@@ -0,0 +1,172 @@
+"""Constant-memory iteration over quotes as plain rows.
+
+Quotes are read with `values()` queries through `.iterator(chunk_size=...)`,
+which uses a server-side cursor on PostgreSQL, so no model instances are
+built and only one chunk of rows is held in memory. Tags are fetched for a
+whole chunk with one query instead of one per quote.
+"""
+import csv
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Quote
+# pylint: disable=no-member
+
+QuoteTags = Quote.tags.through
+
+QUOTE_FIELDS = ('id', 'text', 'author_id', 'author__name')
+
+CSV_HEADER = ('id', 'author', 'text', 'tags')
+CSV_TAG_SEPARATOR = ';'
+
+
+def chunked(iterable, size):
+    """Yields lists of at most `size` items from `iterable`.
+
+    Only one chunk is held in memory at a time, so consuming a cursor
+    through this generator keeps memory bounded by the chunk size.
+    """
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def quote_rows(queryset):
+    """Returns `queryset` as a `values()` query with the serialized fields."""
+    return queryset.values(*QUOTE_FIELDS)
+
+
+def serialize_rows(rows):
+    """Turns `quote_rows` rows into API dictionaries, with their tags.
+
+    The tags of all given rows are loaded with a single query.
+
+    Args:
+        rows (list[dict]): Rows produced by `quote_rows`.
+
+    Returns:
+        list[dict]: `{id, text, author: {id, name}, tags: [{id, name}]}`
+            dictionaries, in the order of `rows`.
+    """
+    return _serialize(rows, _tag_links(rows))
+
+
+async def aserialize_rows(rows):
+    """Async version of `serialize_rows`."""
+    return _serialize(rows, [link async for link in _tag_links(rows)])
+
+
+def _tag_links(rows):
+    """Returns the `(quote_id, tag_id, tag name)` links of the given rows."""
+    return (
+        QuoteTags.objects.filter(quote_id__in=[row['id'] for row in rows])
+        .order_by('quote_id', 'tag__name')
+        .values_list('quote_id', 'tag_id', 'tag__name')
+    )
+
+
+def _serialize(rows, links):
+    tags = defaultdict(list)
+    for quote_id, tag_id, name in links:
+        tags[quote_id].append({'id': tag_id, 'name': name})
+
+    return [
+        {
+            'id': row['id'],
+            'text': row['text'],
+            'author': {'id': row['author_id'], 'name': row['author__name']},
+            'tags': tags[row['id']],
+        }
+        for row in rows
+    ]
+
+
+def iter_quotes(queryset, chunk_size=None):
+    """Yields every quote of `queryset` as an API dictionary, in id order.
+
+    Args:
+        queryset (QuerySet): The quotes to stream.
+        chunk_size (int, optional): Rows per server-side cursor fetch and per
+            tags query. Defaults to `settings.API_STREAM_CHUNK_SIZE`.
+
+    Yields:
+        dict: One serialized quote at a time.
+    """
+    chunk_size = chunk_size or settings.API_STREAM_CHUNK_SIZE
+    rows = quote_rows(queryset).order_by('id').iterator(chunk_size=chunk_size)
+    for chunk in chunked(rows, chunk_size):
+        yield from serialize_rows(chunk)
+
+
+async def aiter_quotes(queryset, chunk_size=None):
+    """Async version of `iter_quotes`, reading rows with `aiterator()`."""
+    chunk_size = chunk_size or settings.API_STREAM_CHUNK_SIZE
+    chunk = []
+    async for row in quote_rows(queryset).order_by('id').aiterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            for quote in await aserialize_rows(chunk):
+                yield quote
+            chunk = []
+    if chunk:
+        for quote in await aserialize_rows(chunk):
+            yield quote
+
+
+class _Echo:
+    """A file-like object whose `write` returns the value, for `csv.writer`."""
+    def write(self, value):
+        """Returns `value` instead of buffering it."""
+        return value
+
+
+def iter_ndjson(quotes):
+    """Yields serialized quotes as newline-delimited JSON lines."""
+    for quote in quotes:
+        yield json.dumps(quote, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def iter_csv(quotes):
+    """Yields serialized quotes as CSV lines, header first.
+
+    Tags are written as their names joined with `CSV_TAG_SEPARATOR`, the
+    same layout `import_quotes` reads back.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for quote in quotes:
+        yield writer.writerow((
+            quote['id'],
+            quote['author']['name'],
+            quote['text'],
+            CSV_TAG_SEPARATOR.join(tag['name'] for tag in quote['tags']),
+        ))
+
+
+EXPORT_FORMATS = {
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+    'csv': (iter_csv, 'text/csv'),
+}
+
+
+def export_lines(queryset, fmt, chunk_size=None):
+    """Yields every quote of `queryset` encoded in the export format `fmt`.
+
+    Args:
+        queryset (QuerySet): The quotes to export.
+        fmt (str): A key of `EXPORT_FORMATS`.
+        chunk_size (int, optional): Rows per server-side cursor fetch.
+
+    Yields:
+        str: Lines of the export, each ending with a newline.
+    """
+    encode, _ = EXPORT_FORMATS[fmt]
+    return encode(iter_quotes(queryset, chunk_size))
@@ -0,0 +1,276 @@
+"""Denormalized tag statistics: usage counters and the tag cloud.
+
+`Tag.usage_count` is adjusted incrementally: by the `m2m_changed` handlers
+in `quotesapp.signals` for changes made through the ORM, and by
+`link_quote_tags` for the bulk migration, which learns exactly which links
+were new from `INSERT ... RETURNING`. Incremental `usage_count + n` updates
+stay correct when several workers link the same tags concurrently. Any
+drift (e.g. from raw SQL) is repaired by `reconcile_usage_counts`, run
+periodically with `manage.py reconcile_tag_counts`.
+
+`TagCooccurrence` counts, for every pair of tags, the quotes carrying both,
+which gives the related tags of a tag with one indexed query. It is kept in
+step by the same code paths, from the full tag sets of the quotes whose links
+change, and rebuilt in one set-based statement by `rebuild_cooccurrences`
+after bulk imports that bypass them (`manage.py rebuild_tag_cooccurrences`).
+"""
+from collections import Counter, defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Quote, Tag, TagCooccurrence
+from .versions import TAG_CLOUD, bump_versions
+# pylint: disable=no-member
+
+QuoteTags = Quote.tags.through
+
+LINK_BATCH_SIZE = 1000
+
+
+def adjust_usage_counts(deltas):
+    """Adds the given deltas to `Tag.usage_count` in a single UPDATE.
+
+    The tag rows are locked in id order first, so concurrent writers touching
+    overlapping tags cannot deadlock.
+
+    Args:
+        deltas (Mapping[int, int]): Mapping of tag id to the change in usage.
+    """
+    deltas = {tag_id: delta for tag_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    list(
+        Tag.objects.filter(id__in=deltas).order_by('id')
+        .select_for_update().values_list('id', flat=True)
+    )
+    Tag.objects.filter(id__in=deltas).update(
+        usage_count=F('usage_count') + Case(
+            *(When(id=tag_id, then=Value(delta)) for tag_id, delta in deltas.items()),
+            default=Value(0),
+        )
+    )
+    bump_versions([TAG_CLOUD])
+
+
+def cooccurrence_deltas(changes, delta):
+    """Computes the co-occurrence changes caused by linking or unlinking tags.
+
+    Args:
+        changes (Iterable[tuple[set, set]]): For each affected quote, its full
+            set of tags (including the changed ones, i.e. after an add or
+            before a removal) and the set of tags added or removed.
+        delta (int): 1 for added links, -1 for removed ones.
+
+    Returns:
+        Counter: Mapping of `(tag_id, related_id)` to the change in count,
+        with every pair in both directions.
+    """
+    deltas = Counter()
+    for tags, changed in changes:
+        for tag_id in changed:
+            for other in tags:
+                if other != tag_id:
+                    deltas[tag_id, other] += delta
+                    if other not in changed:
+                        deltas[other, tag_id] += delta
+    return deltas
+
+
+def adjust_cooccurrences(deltas):
+    """Applies `cooccurrence_deltas` to `TagCooccurrence`.
+
+    Increments are upserted with `INSERT ... ON CONFLICT DO UPDATE`, in pair
+    order so concurrent writers lock rows in the same order; decrements are
+    applied with one UPDATE and pairs that drop to zero are deleted.
+
+    Args:
+        deltas (Mapping[tuple[int, int], int]): Change per `(tag_id, related_id)`.
+    """
+    added = sorted((pair, delta) for pair, delta in deltas.items() if delta > 0)
+    removed = {pair: delta for pair, delta in deltas.items() if delta < 0}
+    table = connection.ops.quote_name(TagCooccurrence._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(added), LINK_BATCH_SIZE):
+            batch = added[start:start + LINK_BATCH_SIZE]
+            placeholders = ', '.join(['(%s, %s, %s)'] * len(batch))
+            cursor.execute(
+                f"INSERT INTO {table} (tag_id, related_id, count) VALUES {placeholders} "
+                f"ON CONFLICT (tag_id, related_id) "
+                f"DO UPDATE SET count = {table}.count + EXCLUDED.count",
+                [value for (tag_id, related_id), delta in batch
+                 for value in (tag_id, related_id, delta)],
+            )
+    if removed:
+        rows = TagCooccurrence.objects.filter(reduce(or_, (
+            Q(tag_id=tag_id, related_id=related_id) for tag_id, related_id in removed
+        )))
+        rows.update(count=Greatest(F('count') + Case(
+            *(When(tag_id=tag_id, related_id=related_id, then=Value(delta))
+              for (tag_id, related_id), delta in removed.items()),
+            default=Value(0),
+        ), Value(0)))
+        rows.filter(count=0).delete()
+
+
+def quote_tag_sets(quote_ids):
+    """Returns the current tag ids of each of the given quotes."""
+    tags = defaultdict(set)
+    links = QuoteTags.objects.filter(quote_id__in=quote_ids).values_list('quote_id', 'tag_id')
+    for quote_id, tag_id in links:
+        tags[quote_id].add(tag_id)
+    return tags
+
+
+def link_quote_tags(pairs):
+    """Inserts `(quote_id, tag_id)` links and counts the ones that were new.
+
+    Existing links are skipped with `ON CONFLICT DO NOTHING`; `RETURNING`
+    reports the rows actually inserted, whose tags then get their usage
+    counters incremented and their co-occurrences with the other tags of
+    the same quotes counted.
+
+    Args:
+        pairs (Iterable[tuple[int, int]]): The links to create.
+
+    Returns:
+        list[tuple[int, int]]: The links that did not exist before.
+    """
+    pairs = sorted(set(pairs))
+    table = connection.ops.quote_name(QuoteTags._meta.db_table)
+    inserted = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(pairs), LINK_BATCH_SIZE):
+            batch = pairs[start:start + LINK_BATCH_SIZE]
+            placeholders = ', '.join(['(%s, %s)'] * len(batch))
+            cursor.execute(
+                f"INSERT INTO {table} (quote_id, tag_id) VALUES {placeholders} "
+                f"ON CONFLICT DO NOTHING RETURNING quote_id, tag_id",
+                [value for pair in batch for value in pair],
+            )
+            inserted.extend(cursor.fetchall())
+    adjust_usage_counts(Counter(tag_id for _, tag_id in inserted))
+
+    added = defaultdict(set)
+    for quote_id, tag_id in inserted:
+        added[quote_id].add(tag_id)
+    if added:
+        tags = quote_tag_sets(list(added))
+        adjust_cooccurrences(cooccurrence_deltas(
+            ((tags[quote_id], new) for quote_id, new in added.items()), 1,
+        ))
+    return inserted
+
+
+def reconcile_usage_counts():
+    """Recomputes every `Tag.usage_count` from the through table.
+
+    Every tag row is locked first, in id order like `adjust_usage_counts`
+    does, so no writer can increment a counter between the count and the
+    update: writers that already committed are counted, and the others wait
+    and apply their increments on top. The counters that drifted are then
+    fixed with one UPDATE, whose statement sees every committed link.
+
+    Returns:
+        int: The number of tags whose counter had drifted.
+    """
+    uses = (
+        QuoteTags.objects.filter(tag_id=OuterRef('id'))
+        .values('tag_id')
+        .annotate(uses=Count('quote_id'))
+        .values('uses')
+    )
+    actual = Coalesce(Subquery(uses), 0)
+    with transaction.atomic():
+        list(Tag.objects.order_by('id').select_for_update().values_list('id', flat=True))
+        drifted = Tag.objects.exclude(usage_count=actual).update(usage_count=actual)
+    if drifted:
+        bump_versions([TAG_CLOUD])
+    return drifted
+
+
+def rebuild_cooccurrences():
+    """Recomputes `TagCooccurrence` from the through table in one statement.
+
+    Used after bulk imports that write links with raw SQL, and to repair
+    drift. Runs in a transaction, so readers see the old rows until the new
+    ones are committed.
+
+    Returns:
+        int: The number of tag pairs (counted in both directions).
+    """
+    table = connection.ops.quote_name(TagCooccurrence._meta.db_table)
+    links = connection.ops.quote_name(QuoteTags._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(
+            f"INSERT INTO {table} (tag_id, related_id, count) "
+            f"SELECT a.tag_id, b.tag_id, COUNT(*) FROM {links} a "
+            f"JOIN {links} b ON b.quote_id = a.quote_id AND b.tag_id <> a.tag_id "
+            f"GROUP BY a.tag_id, b.tag_id"
+        )
+        return cursor.rowcount
+
+
+def related_tags(tag_id, limit):
+    """Returns the tags most often found on quotes together with a tag.
+
+    Read from `TagCooccurrence` with one query on its `(tag, -count)` index.
+
+    Args:
+        tag_id (int): The tag to find related tags for.
+        limit (int): The number of related tags to return.
+
+    Returns:
+        list[dict]: `{id, name, count}` of each related tag, the most frequent
+        first; `count` is the number of quotes carrying both tags.
+    """
+    return [_related(row) for row in _related_tags_query(tag_id, limit)]
+
+
+async def arelated_tags(tag_id, limit):
+    """Async version of `related_tags`."""
+    return [_related(row) async for row in _related_tags_query(tag_id, limit)]
+
+
+def _related_tags_query(tag_id, limit):
+    return (
+        TagCooccurrence.objects.filter(tag_id=tag_id)
+        .order_by('-count', 'related_id')
+        .values_list('related_id', 'related__name', 'count')[:limit]
+    )
+
+
+def _related(row):
+    return dict(zip(('id', 'name', 'count'), row))
+
+
+def top_tags(limit):
+    """Returns the `limit` most used tags, most used first.
+
+    Served by the `(-usage_count, name)` index: the query reads `limit` index
+    entries and no aggregation takes place.
+
+    Args:
+        limit (int): The number of tags to return.
+
+    Returns:
+        list[Tag]: The tags, with `id`, `name` and `usage_count` loaded.
+    """
+    return list(_top_tags_query(limit))
+
+
+async def atop_tags(limit):
+    """Async version of `top_tags`."""
+    return [tag async for tag in _top_tags_query(limit)]
+
+
+def _top_tags_query(limit):
+    return (
+        Tag.objects.filter(usage_count__gt=0)
+        .order_by('-usage_count', 'name')
+        .only('id', 'name', 'usage_count')[:limit]
+    )
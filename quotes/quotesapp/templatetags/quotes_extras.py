@@ -0,0 +1,37 @@
+"""Template tags for quotesapp."""
+from django import template
+from django.conf import settings
+
+from ..tagstats import top_tags
+
+register = template.Library()
+
+
+@register.inclusion_tag('quotesapp/tag_cloud.html', takes_context=True)
+def tag_cloud(context, limit=None):
+    """Renders the most used tags, sized by how often they are used.
+
+    The tags are read from the `Tag.usage_count` index, so the cost depends on
+    `limit` only, not on the number of quotes. Async views, which cannot query
+    the database while rendering, load them beforehand and pass them in the
+    `tag_cloud` context variable.
+
+    Args:
+        limit (int, optional): Number of tags to show. Defaults to
+            `settings.TAG_CLOUD_SIZE`.
+
+    Example Usage:
+        ```
+        {% load quotes_extras %}
+        {% tag_cloud 10 %}
+        ```
+    """
+    tags = context.get('tag_cloud')
+    if tags is None:
+        tags = top_tags(limit or settings.TAG_CLOUD_SIZE)
+    if tags:
+        most, least = tags[0].usage_count, tags[-1].usage_count
+        spread = max(most - least, 1)
+        for tag in tags:
+            tag.weight = 80 + 80 * (tag.usage_count - least) // spread
+    return {'tags': tags}
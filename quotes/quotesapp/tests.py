@@ -0,0 +1,454 @@
+"""Tests for quotesapp: query budgets, the Mongo migration and read routing.
+
+Every view is requested through the test client with `assertNumQueries`
+against a database seeded with skewed synthetic data (`quotesapp.seeding`).
+The budgets are exact statement counts on cold caches, the worst case, and do
+not grow with the number of rows, so a view that goes back to one query per
+quote, author or tag fails. Views that stream every quote declare one
+server-side cursor and read the tags of each streamed chunk with one query,
+and `migrate_data` is given a count per migrated batch.
+A view without a budget test fails `test_every_view_has_a_budget`.
+
+Inside a test every view runs in the test case's transaction, so the
+`transaction.atomic` blocks of a view are counted as `SAVEPOINT` and
+`RELEASE SAVEPOINT` statements, and a logged-in request spends two queries
+on its session and user.
+
+Run with:
+
+    ```
+    python manage.py test quotesapp
+    ```
+"""
+import math
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import mongomock
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import caches
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.urls import URLPattern, get_resolver, reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from . import filler
+from .filler import PARTITION_PREFIX, QUOTES_SOURCE, Authors, Quotes, migrate_data
+from .models import Author, MigrationJob, Quote, SyncCheckpoint, Tag
+from .middleware import PIN_COOKIE
+from .pagination import FORWARD, encode_cursor
+from .routers import begin_request, end_request
+from .seeding import seed_quotes
+from .sources import close_source, override_source
+# pylint: disable=no-member
+
+SEED_QUOTES = 1000
+PASSWORD = 'budget-check-password'
+
+# Small chunk and batch sizes make the seeded data span several of them, so
+# per-chunk and per-batch counts are really exercised.
+STREAM_CHUNK_SIZE = 100
+MIGRATION_BATCH_SIZE = 100
+
+# Statements per migrated batch of `MIGRATION_BATCH_SIZE` documents, with the
+# BEGIN and COMMIT of its transaction and of the change versions flushed after
+# it, plus a fixed amount per run for the checkpoint lookups and creation.
+MIGRATION_QUERIES_PER_BATCH = 18
+MIGRATION_QUERIES_PER_RUN = 4
+
+BUDGETED_VIEWS = {
+    'quotesapp:main', 'quotesapp:tag', 'quotesapp:author', 'quotesapp:quote',
+    'quotesapp:author_quotes', 'quotesapp:quotes_by_tags', 'quotesapp:quotes_by_tag',
+    'quotesapp:search', 'quotesapp:migration', 'quotesapp:migration_status',
+    'quotesapp:export', 'quotesapp:db_pool', 'quotesapp:api_quotes',
+    'quotesapp:api_random_quote', 'quotesapp:api_quote_of_the_day',
+    'quotesapp:api_author_quotes', 'quotesapp:api_tag_quotes',
+    'users:signup', 'users:login', 'users:logout', 'users:password_reset',
+    'users:password_reset_done', 'users:password_reset_confirm',
+    'users:password_reset_complete',
+}
+
+LOCAL_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'query-budgets-{alias}'}
+    for alias in settings.CACHES
+}
+
+
+class _ThreadPool(ThreadPoolExecutor):
+    """Runs migration partitions in threads of the test process.
+
+    Worker processes would connect to the configured database rather than
+    the test database, and could not read the in-memory source.
+    """
+
+    def __init__(self, max_workers, mp_context=None, initializer=None):
+        super().__init__(max_workers=max_workers)
+
+
+def _chunks(rows):
+    return max(math.ceil(rows / STREAM_CHUNK_SIZE), 1)
+
+
+@override_settings(
+    DATABASE_REPLICAS=[], API_STREAM_CHUNK_SIZE=STREAM_CHUNK_SIZE, CACHES=LOCAL_CACHES,
+)
+class QueryBudgetTestCase(TestCase):
+    """Seeds the database once and requests views on cold caches."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_quotes(SEED_QUOTES, authors=50, tags=30, seed=0)
+        cls.quotes = Quote.objects.count()
+        # Zipf ranks follow insertion order: the first author and tag are
+        # the most popular ones.
+        cls.author = Author.objects.order_by('id').first()
+        cls.tags = list(Tag.objects.order_by('id').values_list('id', flat=True)[:3])
+        cls.user = get_user_model().objects.create_user(
+            'budget', 'budget@example.com', PASSWORD,
+        )
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def request(self, queries, view, args=None, data=None, method='get', login=False):
+        """Requests `view` and asserts that it runs exactly `queries` queries.
+
+        Commit hooks, such as the change version flush, run and are counted
+        as if the request's transaction had committed.
+
+        Returns:
+            HttpResponse: The response, whose streamed content (if any) has
+            been consumed within the count.
+        """
+        if login:
+            self.client.force_login(self.user)
+        with self.assertNumQueries(queries), self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(reverse(view, args=args), data or {})
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400)
+        return response
+
+
+class BudgetCoverageTests(TestCase):
+    """Checks that the budget tests cover every view."""
+
+    def test_every_view_has_a_budget(self):
+        names = set()
+        for namespace in ('quotesapp', 'users'):
+            _, resolver = get_resolver().namespace_dict[namespace]
+            names |= {f"{namespace}:{pattern.name}" for pattern in resolver.url_patterns
+                      if isinstance(pattern, URLPattern) and pattern.name}
+        self.assertEqual(names - BUDGETED_VIEWS, set())
+
+
+class PageQueryBudgetTests(QueryBudgetTestCase):
+    """HTML pages: fixed counts whatever the page size or depth."""
+
+    def test_main(self):
+        self.request(6, 'quotesapp:main')
+
+    def test_main_deep_page(self):
+        ids = list(Quote.objects.order_by('id').values_list('id', flat=True))
+        self.request(6, 'quotesapp:main', data={'cursor': encode_cursor(FORWARD, ids[len(ids) // 2])})
+
+    def test_author_quotes(self):
+        self.request(8, 'quotesapp:author_quotes', args=[self.author.id])
+
+    def test_quotes_by_tag(self):
+        self.request(8, 'quotesapp:quotes_by_tag', args=[self.tags[0]])
+
+    def test_quotes_by_tags(self):
+        self.request(6, 'quotesapp:quotes_by_tags', data={
+            'all': f'{self.tags[0]},{self.tags[1]}', 'any': f'{self.tags[2]}',
+        })
+
+    def test_search(self):
+        self.request(4, 'quotesapp:search', data={'q': 'love'})
+
+
+class FormQueryBudgetTests(QueryBudgetTestCase):
+    """Create forms, for a logged-in user."""
+
+    def test_tag_form(self):
+        self.request(3, 'quotesapp:tag', login=True)
+
+    def test_tag_create(self):
+        self.request(4, 'quotesapp:tag', data={'name': 'Budget tag'}, method='post', login=True)
+
+    def test_author_form(self):
+        self.request(3, 'quotesapp:author', login=True)
+
+    def test_author_create(self):
+        self.request(4, 'quotesapp:author', data={'name': 'Budget author'},
+                     method='post', login=True)
+
+    def test_quote_form(self):
+        self.request(5, 'quotesapp:quote', login=True)
+
+    def test_quote_create(self):
+        # Session and user (2), duplicate probe and author lookup (2), and in
+        # a savepoint (2): the insert (1), the tag ids and Django's
+        # existing-link probe (2), the link insert (1), the locked usage
+        # counters (2), the quote's tags and the co-occurrence upsert (2);
+        # then the change versions, flushed after the commit (1).
+        self.request(15, 'quotesapp:quote', data={
+            'text': 'Budget quote', 'author': self.author.id, 'tags': self.tags,
+        }, method='post', login=True)
+
+
+class MigrationQueryBudgetTests(QueryBudgetTestCase):
+    """The migration job views and `migrate_data` itself."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # An active job makes the migration view return it instead of
+        # starting the background worker.
+        cls.job = MigrationJob.objects.create(status=MigrationJob.PENDING)
+
+    def test_migration_start(self):
+        self.request(6, 'quotesapp:migration', method='post', login=True)
+
+    def test_migration_status(self):
+        self.request(3, 'quotesapp:migration_status', args=[self.job.id], login=True)
+
+
+@override_settings(DATABASE_REPLICAS=[], CACHES=LOCAL_CACHES)
+class MigrateDataTests(TransactionTestCase):
+    """`migrate_data` from an in-memory mongomock source.
+
+    Every chunk really commits here, so the change versions flushed after
+    each commit are counted.
+    """
+
+    def setUp(self):
+        override_source(host='mongodb://localhost', mongo_client_class=mongomock.MongoClient)
+        self.addCleanup(close_source)
+
+    def insert_source_quotes(self, docs):
+        """Inserts `docs` quotes by `docs // 20` authors into the source."""
+        authors = Authors.objects.insert([
+            Authors(fullname=f"Budget Author {index}") for index in range(docs // 20)
+        ])
+        Quotes.objects.insert([
+            Quotes(
+                quote=f"Budget migrated quote {index}",
+                author=authors[index % len(authors)],
+                tags=[f'budget-{index % 7}', f'budget-{index % 11}'],
+            )
+            for index in range(docs)
+        ])
+
+    def test_migrate_data_per_batch(self):
+        docs = 500
+        self.insert_source_quotes(docs)
+        with CaptureQueriesContext(connection) as captured:
+            migrated = migrate_data(batch_size=MIGRATION_BATCH_SIZE, workers=1)
+
+        self.assertEqual(migrated, docs)
+        batches = math.ceil(docs / MIGRATION_BATCH_SIZE)
+        self.assertEqual(
+            len(captured), MIGRATION_QUERIES_PER_RUN + MIGRATION_QUERIES_PER_BATCH * batches,
+        )
+
+    def migrate_parallel(self, workers):
+        """Runs `migrate_data` with its partitions in threads."""
+        with mock.patch.object(filler, 'ProcessPoolExecutor', _ThreadPool), \
+                mock.patch.object(filler, 'close_source'):
+            return migrate_data(batch_size=MIGRATION_BATCH_SIZE, workers=workers)
+
+    def assert_migrated(self, docs):
+        """Checks the rows and checkpoint of a completed migration."""
+        source = list(Quotes.objects.order_by('id').as_pymongo())
+        links = sum(len(set(doc['tags'])) for doc in source)
+        self.assertEqual(Quote.objects.count(), docs)
+        self.assertEqual(Author.objects.count(), docs // 20)
+        self.assertEqual(Tag.objects.count(), len({name for doc in source for name in doc['tags']}))
+        self.assertEqual(Quote.tags.through.objects.count(), links)
+        self.assertEqual(sum(Tag.objects.values_list('usage_count', flat=True)), links)
+        self.assertEqual(
+            list(SyncCheckpoint.objects.values_list('source', 'last_id')),
+            [(QUOTES_SOURCE, str(source[-1]['_id']))],
+        )
+
+    def test_migrate_data_parallel(self):
+        docs = 500
+        self.insert_source_quotes(docs)
+
+        self.assertEqual(self.migrate_parallel(workers=2), docs)
+        self.assert_migrated(docs)
+
+    def test_migrate_data_parallel_resumes_partitions(self):
+        docs = 500
+        self.insert_source_quotes(docs)
+        ids = [doc['_id'] for doc in Quotes.objects.order_by('id').only('id').as_pymongo()]
+        migrate_chunk = filler._migrate_chunk
+
+        def failing_chunk(chunk):
+            # The second chunk of the second partition.
+            if chunk[0]['_id'] == ids[docs // 2 + MIGRATION_BATCH_SIZE]:
+                raise RuntimeError('source went away')
+            migrate_chunk(chunk)
+
+        with mock.patch.object(filler, '_migrate_chunk', failing_chunk), \
+                self.assertRaisesMessage(RuntimeError, 'source went away'):
+            self.migrate_parallel(workers=2)
+
+        partitions = dict(
+            SyncCheckpoint.objects.filter(source__startswith=PARTITION_PREFIX)
+            .values_list('source', 'last_id')
+        )
+        first, second = (f'{PARTITION_PREFIX}{ids[index]}' for index in (docs // 2 - 1, docs - 1))
+        self.assertEqual(set(partitions), {first, second})
+        self.assertEqual(partitions[second], str(ids[docs // 2 + MIGRATION_BATCH_SIZE - 1]))
+        self.assertLessEqual(partitions[first], str(ids[docs // 2 - 1]))
+        self.assertFalse(SyncCheckpoint.objects.filter(source=QUOTES_SOURCE).exists())
+
+        # A single worker resumes the interrupted partitions.
+        self.migrate_parallel(workers=1)
+        self.assert_migrated(docs)
+
+
+class ApiQueryBudgetTests(QueryBudgetTestCase):
+    """JSON API and streamed downloads."""
+
+    def test_api_quotes_page(self):
+        self.request(2, 'quotesapp:api_quotes')
+
+    def test_api_quotes_stream(self):
+        self.request(1 + _chunks(self.quotes), 'quotesapp:api_quotes', data={'stream': '1'})
+
+    def test_export(self):
+        self.request(3 + _chunks(self.quotes), 'quotesapp:export',
+                     data={'format': 'csv'}, login=True)
+
+    def test_api_random_quote(self):
+        self.request(2, 'quotesapp:api_random_quote')
+
+    def test_api_quote_of_the_day(self):
+        # The first request of the day draws the quote and stores it.
+        self.request(5, 'quotesapp:api_quote_of_the_day')
+
+    def test_api_author_quotes(self):
+        self.request(3, 'quotesapp:api_author_quotes', args=[self.author.id])
+
+    def test_api_tag_quotes(self):
+        self.request(3, 'quotesapp:api_tag_quotes', args=[self.tags[0]])
+
+    def test_db_pool(self):
+        self.request(2, 'quotesapp:db_pool', login=True)
+
+
+class UsersQueryBudgetTests(QueryBudgetTestCase):
+    """Sign-up, login and password reset pages of the users app."""
+
+    def test_signup_form(self):
+        self.request(1, 'users:signup')
+
+    def test_signup(self):
+        self.request(3, 'users:signup', data={
+            'username': 'budget2', 'email': 'budget2@example.com',
+            'password1': PASSWORD, 'password2': PASSWORD,
+        }, method='post')
+
+    def test_login_form(self):
+        self.request(1, 'users:login')
+
+    def test_login(self):
+        self.request(9, 'users:login', data={'username': 'budget', 'password': PASSWORD},
+                     method='post')
+
+    def test_logout(self):
+        self.request(4, 'users:logout', method='post', login=True)
+
+    def test_password_reset_form(self):
+        self.request(1, 'users:password_reset')
+
+    def test_password_reset(self):
+        self.request(1, 'users:password_reset', data={'email': 'budget@example.com'},
+                     method='post')
+
+    def test_password_reset_done(self):
+        self.request(1, 'users:password_reset_done')
+
+    def test_password_reset_confirm(self):
+        self.request(5, 'users:password_reset_confirm', args=[
+            urlsafe_base64_encode(force_bytes(self.user.pk)),
+            default_token_generator.make_token(self.user),
+        ])
+
+    def test_password_reset_complete(self):
+        self.request(1, 'users:password_reset_complete')
+
+
+# A replica alias mirroring the primary, declared like the configured
+# replicas in settings.py, so routing is tested without a real replica. It is
+# added on import, since the test runner sets up the databases of every test
+# class before running any.
+REPLICA = 'replica-mirror'
+connections.settings.setdefault(REPLICA, {
+    **connections.settings[DEFAULT_DB_ALIAS],
+    'TEST': {**connections.settings[DEFAULT_DB_ALIAS]['TEST'], 'MIRROR': DEFAULT_DB_ALIAS},
+})
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA], CACHES=LOCAL_CACHES)
+class ReplicaRoutingTests(TransactionTestCase):
+    """`ReplicaRouter` with a replica that mirrors the test database.
+
+    The replica alias is a separate connection to the same database, as
+    `TEST['MIRROR']` makes it in tests, so each test can tell from the
+    queries of each connection where a read was routed. Test data is
+    committed, so both connections see it.
+    """
+    databases = {DEFAULT_DB_ALIAS, REPLICA}
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        token = begin_request()
+        self.addCleanup(end_request, token)
+
+    def assertRoutedTo(self, alias, func):
+        """Runs `func` and asserts that only `alias` received queries."""
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary, \
+                CaptureQueriesContext(connections[REPLICA]) as replica:
+            func()
+        used = {name for name, queries in ((DEFAULT_DB_ALIAS, primary), (REPLICA, replica))
+                if len(queries)}
+        self.assertEqual(used, {alias})
+
+    def test_reads_go_to_the_replica(self):
+        self.assertRoutedTo(REPLICA, lambda: list(Tag.objects.all()))
+
+    def test_reads_after_a_write_stay_on_the_primary(self):
+        self.assertRoutedTo(DEFAULT_DB_ALIAS, lambda: Tag.objects.create(name='written'))
+        self.assertRoutedTo(DEFAULT_DB_ALIAS, lambda: list(Tag.objects.all()))
+
+    def test_reads_in_a_transaction_stay_on_the_primary(self):
+        def read_in_transaction():
+            with transaction.atomic():
+                list(Tag.objects.all())
+        self.assertRoutedTo(DEFAULT_DB_ALIAS, read_in_transaction)
+
+    def test_pin_cookie_keeps_the_next_requests_on_the_primary(self):
+        user = get_user_model().objects.create_user('router', 'router@example.com', PASSWORD)
+        self.client.force_login(user)
+        main = reverse('quotesapp:main')
+
+        self.assertRoutedTo(REPLICA, lambda: self.client.get(main))
+        self.assertRoutedTo(DEFAULT_DB_ALIAS, lambda: self.client.post(
+            reverse('quotesapp:tag'), {'name': 'Pinned tag'},
+        ))
+        self.assertIn(PIN_COOKIE, self.client.cookies)
+        self.assertRoutedTo(DEFAULT_DB_ALIAS, lambda: self.client.get(main))
+
+        del self.client.cookies[PIN_COOKIE]
+        self.assertRoutedTo(REPLICA, lambda: self.client.get(main))
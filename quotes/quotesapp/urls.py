@@ -1,15 +1,54 @@
 """Url list for quotesapp"""
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'quotesapp'
 
+# The read-heavy pages and the JSON API have async twins for ASGI servers;
+# under WSGI the sync views avoid the async-to-sync hop.
+ASYNC = settings.QUOTES_ASYNC_VIEWS
+
 urlpatterns = [
-    path('', views.main, name='main'),
+    path('', views.amain if ASYNC else views.main, name='main'),
     path('tag/', views.tag, name='tag'),
     path('author/', views.author, name='author'),
     path('quote/', views.quote, name='quote'),
-    path('authors/<int:author_id>/', views.author_quotes, name='author_quotes'),
-    path('tags/<int:tag_id>/', views.quotes_by_tag, name='quotes_by_tag'),
+    path(
+        'authors/<int:author_id>/',
+        views.aauthor_quotes if ASYNC else views.author_quotes,
+        name='author_quotes',
+    ),
+    path('tags/', views.quotes_by_tags, name='quotes_by_tags'),
+    path(
+        'tags/<int:tag_id>/',
+        views.aquotes_by_tag if ASYNC else views.quotes_by_tag,
+        name='quotes_by_tag',
+    ),
+    path('search/', views.search, name='search'),
     path('migration/', views.migration, name='migration'),
+    path('migration/<int:job_id>/', views.migration_status, name='migration_status'),
+    path('export/', views.export, name='export'),
+    path('metrics/db-pool/', views.db_pool, name='db_pool'),
+    path('api/quotes/', api.aquotes if ASYNC else api.quotes, name='api_quotes'),
+    path(
+        'api/quotes/random/',
+        api.arandom_quote if ASYNC else api.random_quote,
+        name='api_random_quote',
+    ),
+    path(
+        'api/quotes/today/',
+        api.aquote_of_the_day if ASYNC else api.quote_of_the_day,
+        name='api_quote_of_the_day',
+    ),
+    path(
+        'api/authors/<int:author_id>/quotes/',
+        api.aauthor_quotes if ASYNC else api.author_quotes,
+        name='api_author_quotes',
+    ),
+    path(
+        'api/tags/<int:tag_id>/quotes/',
+        api.atag_quotes if ASYNC else api.tag_quotes,
+        name='api_tag_quotes',
+    ),
 ]
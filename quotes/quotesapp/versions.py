@@ -0,0 +1,223 @@
+"""Change versions of the quotes catalogue and HTTP validators built on them.
+
+Read views declare which scopes their output depends on. A conditional GET
+then only costs one primary-key lookup on `ChangeVersion`: if the client's
+ETag (or Last-Modified date) still matches, Django answers `304 Not Modified`
+before the view runs its quotes queries or renders a template.
+"""
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+from functools import partial, wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import ChangeVersion
+# pylint: disable=no-member
+
+QUOTES = 'quotes'
+AUTHORS = 'authors'
+TAGS = 'tags'
+TAG_CLOUD = 'tag-cloud'
+
+# Version of scopes that have never been bumped ("version 0").
+NEVER_CHANGED = datetime.fromtimestamp(0, tz=dt_timezone.utc)
+
+
+def author_scope(author_id):
+    """Returns the scope of one author's page."""
+    return f'author:{author_id}'
+
+
+def tag_scope(tag_id):
+    """Returns the scope of one tag's page."""
+    return f'tag:{tag_id}'
+
+
+def bump_versions(scopes):
+    """Marks the given scopes as changed once the current transaction commits.
+
+    Scopes bumped during a transaction are collected on the database
+    connection and written after the commit, all at once, with one
+    `INSERT ... ON CONFLICT DO UPDATE` in scope order. A transaction never
+    holds `ChangeVersion` row locks while it goes on to lock tag counters or
+    quotes, so writers that bump and lock in different orders (a quote
+    posted during a migration or an import) cannot deadlock, and concurrent
+    flushes lock the version rows in the same order. Outside a transaction
+    the scopes are written right away.
+
+    A reader may see committed data under the previous versions until the
+    flush: its cards and ETags are then retired by the bump that follows.
+    Scopes bumped in a transaction that is rolled back are flushed with the
+    next commit on the connection, which only costs those pages a
+    revalidation.
+
+    Args:
+        scopes (Iterable[str]): The scopes that changed.
+    """
+    scopes = set(scopes)
+    if not scopes:
+        return
+    using = router.db_for_write(ChangeVersion)
+    _pending_versions(using).update(scopes)
+    transaction.on_commit(partial(_flush_versions, using), using=using)
+
+
+def _pending_versions(using):
+    """Returns the set of scopes waiting for a commit on a connection."""
+    connection = connections[using]
+    if not hasattr(connection, 'pending_versions'):
+        connection.pending_versions = set()
+    return connection.pending_versions
+
+
+def _flush_versions(using):
+    """Writes the pending scopes of a connection; runs after a commit.
+
+    Every `bump_versions` call of a transaction registers this callback:
+    the first one writes all the scopes, the others find nothing left. If
+    the write fails, the scopes stay pending for the next commit.
+    """
+    pending = _pending_versions(using)
+    if not pending:
+        return
+    now = timezone.now()
+    ChangeVersion.objects.using(using).bulk_create(
+        [ChangeVersion(scope=scope, changed_at=now) for scope in sorted(pending)],
+        update_conflicts=True,
+        unique_fields=['scope'],
+        update_fields=['changed_at'],
+    )
+    pending.clear()
+
+
+def get_versions(scopes):
+    """Returns the last change time of each scope.
+
+    This is a pure read: scopes that have never been bumped have no row and
+    get `NEVER_CHANGED`. Rows are only created by `bump_versions`, so a GET
+    never writes (and is never pinned to the primary database), and a row
+    missing on a lagging replica cannot make the version flip.
+
+    Args:
+        scopes (Iterable[str]): The scopes to look up.
+
+    Returns:
+        dict: Mapping of scope to `changed_at`.
+    """
+    scopes = list(scopes)
+    found = ChangeVersion.objects.in_bulk(scopes)
+    return {
+        scope: found[scope].changed_at if scope in found else NEVER_CHANGED
+        for scope in scopes
+    }
+
+
+async def aget_versions(scopes):
+    """Async version of `get_versions`."""
+    scopes = list(scopes)
+    found = await ChangeVersion.objects.ain_bulk(scopes)
+    return {
+        scope: found[scope].changed_at if scope in found else NEVER_CHANGED
+        for scope in scopes
+    }
+
+
+def request_versions(request, scopes):
+    """Returns the versions of `scopes` for the current request.
+
+    Versions already loaded by `versioned` for the request are reused, so a
+    view can key its own caches on them without querying again.
+
+    Args:
+        request (HttpRequest): The request being served.
+        scopes (Iterable[str]): The scopes to look up.
+
+    Returns:
+        dict: Mapping of scope to `changed_at`.
+    """
+    loaded = getattr(request, '_quote_versions', {})
+    scopes = list(scopes)
+    missing = [scope for scope in scopes if scope not in loaded]
+    return {**{scope: loaded[scope] for scope in scopes if scope in loaded},
+            **(get_versions(missing) if missing else {})}
+
+
+async def arequest_versions(request, scopes):
+    """Async version of `request_versions`."""
+    loaded = getattr(request, '_quote_versions', {})
+    scopes = list(scopes)
+    missing = [scope for scope in scopes if scope not in loaded]
+    return {**{scope: loaded[scope] for scope in scopes if scope in loaded},
+            **(await aget_versions(missing) if missing else {})}
+
+
+def versioned(scopes):
+    """Decorates a read view with ETag and Last-Modified validators.
+
+    The ETag combines the versions of the view's scopes with the current user
+    (the page header differs per user) and the quote card version. The
+    Last-Modified date is only sent to anonymous users, since it cannot tell
+    apart pages rendered for different users, and only once one of the
+    scopes has been bumped (`NEVER_CHANGED` is not a real date). Responses are marked
+    `Cache-Control: no-cache`, so browsers and proxies may store them but must
+    revalidate, which is exactly the cheap conditional request.
+
+    Async views are supported too. Their versions and user are loaded with
+    the async ORM before `condition` calls the validators, which then only
+    read what was loaded, so no database query runs in the event loop.
+
+    Args:
+        scopes (callable): Called with the view's URL kwargs; returns the
+            scopes the page depends on.
+
+    Returns:
+        callable: A view decorator.
+
+    Example Usage:
+        ```python
+        @versioned(lambda author_id: [author_scope(author_id), TAGS])
+        def author_quotes(request, author_id):
+            ...
+        ```
+    """
+    def versions(request, *args, **kwargs):
+        if not hasattr(request, '_quote_versions'):
+            request._quote_versions = get_versions(scopes(*args, **kwargs))
+        return request._quote_versions
+
+    def etag(request, *args, **kwargs):
+        user_id = request.user.pk if request.user.is_authenticated else 0
+        state = sorted(versions(request, *args, **kwargs).items())
+        raw = repr((state, user_id, settings.QUOTE_CARD_VERSION))
+        return hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        return max(versions(request, *args, **kwargs).values())
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                request._quote_versions = await aget_versions(scopes(*args, **kwargs))
+                request.user = await request.auser()
+                response = await conditional_view(request, *args, **kwargs)
+                patch_cache_control(response, no_cache=True)
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
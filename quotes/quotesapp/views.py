@@ -1,30 +1,52 @@
 """Views for quoresapp"""
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from .forms import TagForm, AuthorForm, QuoteForm
-from .models import Tag, Author, Quote
-from .filler import migrate_data
+from .models import Tag, Author, Quote, MigrationJob
+from .jobs import enqueue_migration
+from .cards import aload_cards, load_cards, render_cards
+from .dbpool import pool_stats
+from .pagination import apaginate_request, get_page_size, paginate_request, ranked_paginate
+from .profiles import aauthor_profile, author_profile
+from .queries import parse_ids, tagged_quote_ids
+from .streaming import EXPORT_FORMATS, export_lines
+from .tagstats import arelated_tags, atop_tags, related_tags
+from .versions import AUTHORS, QUOTES, TAGS, TAG_CLOUD, author_scope, tag_scope, versioned
 # pylint: disable=no-member
 
 
+@versioned(lambda: [QUOTES, TAG_CLOUD])
 def main(request):
-    """Displays the main page with a list of all quotes.
+    """Displays the main page with a paginated list of quotes.
 
-    This view retrieves all the quotes from the database and renders them
-    on the main page of the application. It is typically used to show a
-    summary or list of quotes to users.
+    This view retrieves the ids of one page of quotes using keyset
+    pagination on `Quote.id`, so the cost of a page does not depend on how
+    deep it is. The quote cards are then taken from the fragment cache (see
+    `quotesapp.cards`); only quotes missing from it are loaded, with their
+    authors and tags in two queries, which keeps every page at a fixed
+    number of queries regardless of the table size. Conditional requests are
+    answered with `304 Not Modified` while no quote, author or tag has changed
+    and the tag cloud is the same (see `quotesapp.versions`).
 
     Args:
-        request (HttpRequest): The HTTP request object. This is usually a
-        GET request that is handled to retrieve and display data.
+        request (HttpRequest): The HTTP request object. The optional `cursor`
+        and `per_page` GET parameters select the page to show.
 
     Returns:
         HttpResponse: A response object that renders the 'index.html'
-        template with all the quotes.
+        template with one page of quotes.
 
     Context:
-        quotes (QuerySet): A queryset containing all the Quote objects
-        retrieved from the database.
+        quotes (KeysetPage): The page of quote ids, with the next/previous
+        cursors.
+        cards (list): The rendered quote cards of the page.
 
     Example Usage:
         URL pattern in `urls.py`:
@@ -39,9 +61,12 @@ def main(request):
         /
         ```
     """
-    quotes = Quote.objects.all()
+    quotes = paginate_request(request, Quote.objects.values('id'))
 
-    return render(request, 'quotesapp/index.html', {"quotes": quotes})
+    return render(request, 'quotesapp/index.html', {
+        "quotes": quotes,
+        "cards": load_cards(row['id'] for row in quotes),
+    })
 
 @login_required
 def tag(request):
@@ -133,9 +158,11 @@ def quote(request):
 
     This view allows authenticated users to submit a new quote. Users must
     select an author and one or more tags associated with the quote. If the
-    author is not selected, an error message is displayed. Upon successful
-    submission, the quote is saved to the database and the user is redirected
-    to the main quotes page.
+    author is not selected, an error message is displayed. A quote the author
+    already has is rejected by the form, or by the unique index if the same
+    quote is posted twice at once, and the form is shown again with the
+    error. Upon successful submission, the quote is saved to the database and
+    the user is redirected to the main quotes page.
 
     Args:
         request (HttpRequest): The HTTP request object.
@@ -173,40 +200,57 @@ def quote(request):
             tags_ids = request.POST.getlist('tags')
 
             if author_id:
-                quote_.author = Author.objects.get(id=author_id)
+                quote_.author = Author.objects.only('id').get(id=author_id)
             else:
                 return render(request, 'quotesapp/quote.html', {
                     'form': form,
-                    'authors': Author.objects.all(),
+                    'authors': Author.objects.only('id', 'name'),
                     'tags': Tag.objects.all(),
                     'error': 'Author must be selected!'
                 })
 
-            quote_.save()
-
-            for tag_id in tags_ids:
-                tag_ = Tag.objects.get(id=tag_id)
-                quote_.tags.add(tag_)
-
-            return redirect('quotesapp:main')
+            try:
+                with transaction.atomic():
+                    quote_.save()
+                    # One `add` call links every tag with a single insert and
+                    # one `m2m_changed` round, instead of queries per tag.
+                    quote_.tags.add(
+                        *Tag.objects.filter(id__in=tags_ids).values_list('id', flat=True)
+                    )
+            except IntegrityError:
+                # The same quote was posted concurrently, after `clean`
+                # checked for it: its unique index rejected this insert.
+                if not Quote.objects.filter(
+                    author_id=quote_.author_id, content_hash=quote_.content_hash,
+                ).exists():
+                    raise
+                form.add_error('text', QuoteForm.DUPLICATE_ERROR)
+            else:
+                return redirect('quotesapp:main')
     else:
         form = QuoteForm()
 
     return render(request, 'quotesapp/quote.html', {
         'form': form,
-        'authors': Author.objects.all(),
+        'authors': Author.objects.only('id', 'name'),
         'tags': Tag.objects.all(),
     })
 
+@versioned(lambda author_id: [author_scope(author_id), TAGS, TAG_CLOUD])
 def author_quotes(request, author_id):
-    """Displays a list of quotes attributed to a specific author.
+    """Displays a paginated list of quotes attributed to a specific author.
 
-    This view retrieves all quotes associated with a given author, identified
-    by `author_id`. If the author does not exist, a 404 error is raised. The
-    quotes are then displayed on a dedicated page for that author.
+    This view retrieves one page of quotes associated with a given author,
+    identified by `author_id`. If the author does not exist, a 404 error is
+    raised. Pages are cursor-paginated on `Quote.id` and rendered from the
+    quote card cache, loading tags only for cards that are not cached, so a
+    response costs the same number of queries however many quotes the author
+    has. Conditional requests get `304 Not Modified` until the author, their
+    quotes, any tag name or the tag cloud change.
 
     Args:
-        request (HttpRequest): The HTTP request object.
+        request (HttpRequest): The HTTP request object. The optional `cursor`
+            and `per_page` GET parameters select the page to show.
         author_id (int): The ID of the author whose quotes are to be displayed.
 
     Returns:
@@ -218,7 +262,10 @@ def author_quotes(request, author_id):
 
     Context:
         author (Author): The author object corresponding to the provided `author_id`.
-        quotes (QuerySet): A queryset of quotes associated with the specified author.
+        quotes (KeysetPage): One page of quote ids by the specified author.
+        cards (list): The rendered quote cards of the page.
+        profile (dict): The author's quote count and most used tags, see
+            `quotesapp.profiles.author_profile`.
 
     Example Usage:
         URL pattern in `urls.py`:
@@ -235,22 +282,36 @@ def author_quotes(request, author_id):
     """
     author_ = get_object_or_404(Author, id=author_id)
 
-    quotes = Quote.objects.filter(author=author_)
+    quotes = paginate_request(
+        request,
+        Quote.objects.filter(author=author_).values('id'),
+        default_size=settings.AUTHOR_QUOTES_PAGE_SIZE,
+    )
 
     return render(request, 'quotesapp/author_quotes.html', {
         'author': author_,
-        'quotes': quotes
+        'quotes': quotes,
+        'cards': load_cards((row['id'] for row in quotes), 'author'),
+        'profile': author_profile(request, author_.id),
     })
 
+@versioned(lambda tag_id: [tag_scope(tag_id), AUTHORS, TAG_CLOUD])
 def quotes_by_tag(request, tag_id):
-    """Displays a list of quotes associated with a specific tag.
-
-    This view retrieves all quotes that are linked to a given tag, identified by
-    `tag_id`. If the tag does not exist, it raises a 404 error. The quotes
-    associated with the tag are then rendered on a dedicated page.
+    """Displays a paginated list of quotes associated with a specific tag.
+
+    This view retrieves one page of quotes that are linked to a given tag,
+    identified by `tag_id`. If the tag does not exist, it raises a 404 error.
+    Pages of quote ids are cursor-paginated straight off the `Quote.tags`
+    through table and rendered from the quote card cache, so popular tags
+    cost no more per response than rare ones. The related tags, those most
+    often found on the same quotes, are read from the precomputed
+    `TagCooccurrence` counts with one indexed query. Conditional requests get
+    `304 Not Modified` until the tag, its quotes, any author name or the tag
+    cloud change.
 
     Args:
-        request (HttpRequest): The HTTP request object.
+        request (HttpRequest): The HTTP request object. The optional `cursor`
+            and `per_page` GET parameters select the page to show.
         tag_id (int): The ID of the tag used to filter quotes.
 
     Returns:
@@ -262,7 +323,9 @@ def quotes_by_tag(request, tag_id):
 
     Context:
         tag (Tag): The tag object corresponding to the provided `tag_id`.
-        quotes (QuerySet): A queryset of quotes associated with the specified tag.
+        quotes (KeysetPage): One page of quote ids associated with the specified tag.
+        cards (list): The rendered quote cards of the page.
+        related_tags (list): `{id, name, count}` of the related tags.
 
     Example Usage:
         URL pattern in `urls.py`:
@@ -278,37 +341,364 @@ def quotes_by_tag(request, tag_id):
         ```
     """
     tag_ = get_object_or_404(Tag, id=tag_id)
-    quotes = Quote.objects.filter(tags=tag_)
+    quotes = paginate_request(
+        request,
+        Quote.tags.through.objects.filter(tag_id=tag_.id).values('quote_id'),
+        default_size=settings.TAG_QUOTES_PAGE_SIZE,
+        key='quote_id',
+    )
 
     return render(request, 'quotesapp/quotes_by_tag.html', {
         'tag': tag_,
         'quotes': quotes,
+        'cards': load_cards((row['quote_id'] for row in quotes), 'tag'),
+        'related_tags': related_tags(tag_.id, settings.RELATED_TAGS_SIZE),
+    })
+
+@versioned(lambda: [QUOTES, TAG_CLOUD])
+async def amain(request):
+    """Async version of `main`, for deployments served over ASGI.
+
+    The page ids are read with the async ORM, cards come from
+    `aload_cards` and the tag cloud is loaded up front, so rendering the
+    template does not touch the database and the request never leaves the
+    event loop for a thread.
+
+    Args:
+        request (HttpRequest): The HTTP request object, with the same
+            parameters as `main`.
+
+    Returns:
+        HttpResponse: The same page as `main`.
+    """
+    quotes = await apaginate_request(request, Quote.objects.values('id'))
+
+    return render(request, 'quotesapp/index.html', {
+        "quotes": quotes,
+        "cards": await aload_cards(row['id'] for row in quotes),
+        "tag_cloud": await atop_tags(settings.TAG_CLOUD_SIZE),
+    })
+
+@versioned(lambda author_id: [author_scope(author_id), TAGS, TAG_CLOUD])
+async def aauthor_quotes(request, author_id):
+    """Async version of `author_quotes`.
+
+    Args:
+        request (HttpRequest): The HTTP request object, with the same
+            parameters as `author_quotes`.
+        author_id (int): The ID of the author whose quotes are to be displayed.
+
+    Returns:
+        HttpResponse: The same page as `author_quotes`.
+
+    Raises:
+        Http404: If the author with the specified `author_id` does not exist.
+    """
+    author_ = await _aget_or_404(Author.objects.all(), id=author_id)
+
+    quotes = await apaginate_request(
+        request,
+        Quote.objects.filter(author=author_).values('id'),
+        default_size=settings.AUTHOR_QUOTES_PAGE_SIZE,
+    )
+
+    return render(request, 'quotesapp/author_quotes.html', {
+        'author': author_,
+        'quotes': quotes,
+        'cards': await aload_cards((row['id'] for row in quotes), 'author'),
+        'profile': await aauthor_profile(request, author_.id),
+        'tag_cloud': await atop_tags(settings.TAG_CLOUD_SIZE),
+    })
+
+@versioned(lambda tag_id: [tag_scope(tag_id), AUTHORS, TAG_CLOUD])
+async def aquotes_by_tag(request, tag_id):
+    """Async version of `quotes_by_tag`.
+
+    Args:
+        request (HttpRequest): The HTTP request object, with the same
+            parameters as `quotes_by_tag`.
+        tag_id (int): The ID of the tag used to filter quotes.
+
+    Returns:
+        HttpResponse: The same page as `quotes_by_tag`.
+
+    Raises:
+        Http404: If the tag with the specified `tag_id` does not exist.
+    """
+    tag_ = await _aget_or_404(Tag.objects.all(), id=tag_id)
+    quotes = await apaginate_request(
+        request,
+        Quote.tags.through.objects.filter(tag_id=tag_.id).values('quote_id'),
+        default_size=settings.TAG_QUOTES_PAGE_SIZE,
+        key='quote_id',
+    )
+
+    return render(request, 'quotesapp/quotes_by_tag.html', {
+        'tag': tag_,
+        'quotes': quotes,
+        'cards': await aload_cards((row['quote_id'] for row in quotes), 'tag'),
+        'related_tags': await arelated_tags(tag_.id, settings.RELATED_TAGS_SIZE),
+        'tag_cloud': await atop_tags(settings.TAG_CLOUD_SIZE),
+    })
+
+async def _aget_or_404(queryset, **lookup):
+    """Async counterpart of `get_object_or_404`."""
+    try:
+        return await queryset.aget(**lookup)
+    except queryset.model.DoesNotExist as exc:
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.") from exc
+
+def quotes_by_tags(request):
+    """Displays quotes filtered by several tags at once.
+
+    The `all` GET parameter keeps quotes that carry every listed tag (AND),
+    the `any` parameter keeps quotes that carry at least one of them (OR);
+    both can be combined. Matching is done with one grouped query on the
+    `Quote.tags` through table (see `tagged_quote_ids`), paginated on
+    `quote_id`, after which the cards of the current page are taken from the
+    quote card cache.
+
+    Args:
+        request (HttpRequest): The HTTP request object. The `all` and `any`
+            GET parameters hold comma-separated tag ids; `cursor` and
+            `per_page` select the page.
+
+    Returns:
+        HttpResponse: A response object that renders the 'quotes_by_tags.html'
+        template with one page of matching quotes.
+
+    Context:
+        all_tags (QuerySet): The tags every quote must carry.
+        any_tags (QuerySet): The tags of which a quote must carry at least one.
+        cards (list): The rendered quote cards of the current page.
+        page (KeysetPage): The page of matching ids, with its cursors.
+        params (str): The encoded filter, kept in the pagination links.
+
+    Example Usage:
+        URL pattern in `urls.py`:
+
+        ```python
+        path('tags/', views.quotes_by_tags, name='quotes_by_tags')
+        ```
+
+        To find quotes tagged with both 1 and 5, and with 9 or 12:
+
+        ```
+        /tags/?all=1,5&any=9,12
+        ```
+    """
+    all_ids = parse_ids(request.GET.get('all'))
+    any_ids = parse_ids(request.GET.get('any'))
+    tags = Tag.objects.in_bulk(all_ids + any_ids)
+
+    page, cards = [], []
+    if all_ids or any_ids:
+        page = paginate_request(
+            request,
+            tagged_quote_ids(all_ids, any_ids),
+            default_size=settings.TAG_QUOTES_PAGE_SIZE,
+            key='quote_id',
+        )
+        cards = load_cards(row['quote_id'] for row in page)
+
+    params = {}
+    if all_ids:
+        params['all'] = ','.join(map(str, all_ids))
+    if any_ids:
+        params['any'] = ','.join(map(str, any_ids))
+
+    return render(request, 'quotesapp/quotes_by_tags.html', {
+        'all_tags': [tags[id_] for id_ in all_ids if id_ in tags],
+        'any_tags': [tags[id_] for id_ in any_ids if id_ in tags],
+        'cards': cards,
+        'page': page,
+        'params': urlencode(params),
+    })
+
+def search(request):
+    """Displays quotes matching a full-text search query, best match first.
+
+    The query is parsed with `websearch_to_tsquery` semantics (quoted phrases,
+    `or`, `-word`) and matched against the stored, GIN-indexed
+    `Quote.search_vector`, which covers the quote text and the author's name.
+    Results are ranked with `ts_rank` and paginated with a `(rank, id)`
+    cursor, so no page needs to scan or sort the whole table.
+
+    Args:
+        request (HttpRequest): The HTTP request object. The `q` GET parameter
+            holds the search query; `cursor` and `per_page` select the page.
+
+    Returns:
+        HttpResponse: A response object that renders the 'search.html'
+        template with one page of matching quotes.
+
+    Context:
+        query (str): The search query as entered.
+        quotes (RankedPage | list): One page of matching quotes, or an empty
+            list if no query was given.
+        cards (list): The rendered quote cards of the page.
+        params (str): The encoded query, kept in the pagination links.
+
+    Example Usage:
+        URL pattern in `urls.py`:
+
+        ```python
+        path('search/', views.search, name='search')
+        ```
+
+        To search for quotes:
+
+        ```
+        /search/?q=love
+        ```
+    """
+    query = request.GET.get('q', '').strip()
+    quotes = []
+    if query:
+        search_query = SearchQuery(
+            query, config=settings.QUOTES_SEARCH_CONFIG, search_type='websearch'
+        )
+        quotes = ranked_paginate(
+            Quote.objects
+            .filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F('search_vector'), search_query))
+            .select_related('author')
+            .defer('author__description')
+            .prefetch_related('tags'),
+            cursor=request.GET.get('cursor'),
+            per_page=get_page_size(request),
+        )
+
+    return render(request, 'quotesapp/search.html', {
+        'query': query,
+        'quotes': quotes,
+        'cards': render_cards(quotes),
+        'params': urlencode({'q': query}),
     })
 
 @login_required
 def migration(request):
-    """Handles the migration of data from MongoDB to PostgreSQL.
+    """Starts the migration of data from MongoDB to PostgreSQL.
 
-    This view function triggers the data migration process by calling
-    the `migrate_data` function. The migration process is only accessible
-    to logged-in users due to the `@login_required` decorator. After the
-    migration is completed, the user is redirected to the main page.
+    This view enqueues a background migration job and returns immediately;
+    the migration itself runs in the worker from `quotesapp.jobs`, committing
+    one chunk at a time. If a migration is already pending or running, that
+    job is reused instead of starting another one. The view is only
+    accessible to logged-in users due to the `@login_required` decorator.
 
     Args:
         request: The HTTP request object that initiated the migration.
 
     Returns:
-        HttpResponse: A redirect response to the main page of the application
-        after the migration process completes.
+        HttpResponse: A redirect response to the status endpoint of the
+        queued job.
 
     Example Usage:
         This view could be accessed via a URL configured in your `urls.py`,
         typically as an admin or maintenance task.
+    """
+    job = enqueue_migration()
+    return redirect('quotesapp:migration_status', job_id=job.id)
+
+@login_required
+def migration_status(request, job_id):
+    """Reports the progress of a background migration job as JSON.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        job_id (int): The ID of the migration job to report on.
+
+    Returns:
+        JsonResponse: The job status, the processed and total document
+        counts, the throughput in documents per second and any error message.
 
     Raises:
-        Any exception raised by the `migrate_data` function will result in
-        the migration process being halted, and appropriate error handling
-        should be implemented based on your application's needs.
+        Http404: If the job with the specified `job_id` does not exist.
+
+    Example Usage:
+        URL pattern in `urls.py`:
+
+        ```python
+        path('migration/<int:job_id>/', views.migration_status, name='migration_status')
+        ```
+
+        To poll the progress of a job:
+
+        ```
+        /migration/1/
+        ```
+    """
+    job = get_object_or_404(MigrationJob, id=job_id)
+    return JsonResponse(job.as_dict())
+
+@login_required
+def export(request):
+    """Streams a full dump of the quotes as an NDJSON or CSV download.
+
+    Quotes are read through a server-side cursor in chunks and written to the
+    response as they arrive, with the tags of each chunk loaded in a single
+    query, so the download starts at once and memory use does not grow with
+    the size of the catalogue. The same encoders back the `export_quotes`
+    management command.
+
+    Args:
+        request (HttpRequest): The HTTP request object. The optional `format`
+            GET parameter is `ndjson` (the default) or `csv`.
+
+    Returns:
+        StreamingHttpResponse: The export as an attachment, or
+        HttpResponseBadRequest for an unknown format.
+
+    Example Usage:
+        URL pattern in `urls.py`:
+
+        ```python
+        path('export/', views.export, name='export')
+        ```
+
+        To download the quotes as CSV:
+
+        ```
+        /export/?format=csv
+        ```
+    """
+    fmt = request.GET.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f"Unknown export format: {fmt}")
+    _, content_type = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(
+        export_lines(Quote.objects.all(), fmt), content_type=content_type,
+    )
+    response['Content-Disposition'] = f'attachment; filename="quotes.{fmt}"'
+    return response
+
+@login_required
+def db_pool(request):
+    """Reports the database connection pool metrics of this worker as JSON.
+
+    Each worker process has its own pools, so the numbers describe the
+    process that served the request; scrape every worker to get the total.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        JsonResponse: Per database alias, the pool size limits, connections
+        in use and available, waiting requests, wait times and the number of
+        requests that found the pool exhausted (see `quotesapp.dbpool`).
+        Empty when pooling is disabled.
+
+    Example Usage:
+        URL pattern in `urls.py`:
+
+        ```python
+        path('metrics/db-pool/', views.db_pool, name='db_pool')
+        ```
+
+        To read the pool metrics:
+
+        ```
+        /metrics/db-pool/
+        ```
     """
-    migrate_data(request)
-    return redirect('quotesapp:main')
+    return JsonResponse(pool_stats())